@@ -6,27 +6,23 @@ import falcon
 
 from app import log, config
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
 from app.api.common import base
 from app.api.v1 import didtx, did_document, servicecount
 from app.api.v2 import didtxv2
+from app.db import mongo
 from app.errors import AppError
 
-from mongoengine import connect
-
-from app.middleware import AuthMiddleware
+from app.middleware import AuthMiddleware, RateLimitMiddleware
 from app.model import Didtx, DidDocument, Didstate
 
-from app.cronjob import cron_send_tx_to_did_sidechain
-from app.cronjobv2 import cron_send_daily_stats_v2, cron_send_tx_to_did_sidechain_v2, cron_update_recent_did_documents
-
 LOG = log.get_logger()
 
 
-class App(falcon.API):
+class App(falcon.App):
     def __init__(self, *args, **kwargs):
         super(App, self).__init__(*args, **kwargs)
+        # Falcon 3 stopped ignoring the trailing slash of the path by default, keep routing like Falcon 2 did
+        self.req_options.strip_url_path_trailing_slash = True
         LOG.info("API Server is starting")
 
         # Simple endpoint for base
@@ -65,24 +61,16 @@ class App(falcon.API):
         self.add_error_handler(AppError, AppError.handle)
 
 
-# Connect to mongodb
-LOG.info("Connecting to mongodb...")
-connect(
-    config.MONGO['DATABASE'],
-    host=config.MONGO_CONNECT_HOST
-)
-
-LOG.info("Initializing the Falcon REST API service...")
-application = App(middleware=[
-    AuthMiddleware(),
-])
-
-# Start cron scheduler
-scheduler = BackgroundScheduler()
-#scheduler.add_job(cron_send_tx_to_did_sidechain, 'interval', seconds=config.CRON_INTERVAL)
-
-scheduler.add_job(cron_send_tx_to_did_sidechain_v2, 'interval', seconds=config.CRON_INTERVAL_V2)
-scheduler.add_job(cron_update_recent_did_documents, 'interval', seconds=config.CRON_INTERVAL)
-scheduler.add_job(cron_send_daily_stats_v2, 'cron', day='*', hour=0, minute=0)
+def create_app():
+    """
+    Builds the WSGI app, served from app.wsgi. Importing app has no side effect, so the worker and the commands that
+    use the models don't build an app they never serve
+    """
+    # Connect to mongodb
+    mongo.connect()
 
-scheduler.start()
+    LOG.info("Initializing the Falcon REST API service...")
+    return App(middleware=[
+        AuthMiddleware(),
+        RateLimitMiddleware(),
+    ])
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# Coroutine resources of the ASGI app. They serve the same endpoints as app.api.v1 and app.api.v2 using motor and
+# httpx so a request waiting on MongoDB or the DID sidechain doesn't hold up a worker
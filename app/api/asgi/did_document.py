@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from app import log
+from app.api.common import AsyncBaseResource
+from app.model import DidDocument
+from app.service import get_did_documents_async
+from app.service.async_mongo import async_mongo
+from app.service.async_sidechain_rpc import async_did_sidechain_rpc
+
+LOG = log.get_logger()
+
+
+class GetDidDocumentsFromDid(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/documents/did/{did}
+    """
+
+    async def on_get(self, req, res, did):
+        LOG.info(f'Enter /v1/documents/did/{did}')
+        did = did.replace("did:elastos:", "").split("#")[0]
+
+        result = await get_did_documents_async(async_mongo.get_collection(DidDocument), did,
+                                              async_did_sidechain_rpc.get_documents_specific_did)
+
+        self.on_success(res, result)
+
+
+class GetDidDocumentsFromCryptoname(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/documents/crypto_name/{crypto_name}
+    """
+
+    async def on_get(self, req, res, crypto_name):
+        LOG.info(f'Enter /v1/documents/crypto_name/{crypto_name}')
+        did = await async_did_sidechain_rpc.get_did_from_cryptoname(crypto_name)
+
+        result = {}
+        if did:
+            did = did.replace("did:elastos:", "").split("#")[0]
+            result = await get_did_documents_async(async_mongo.get_collection(DidDocument), did,
+                                                   async_did_sidechain_rpc.get_documents_specific_did)
+
+        self.on_success(res, result)
+
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app import log, config
+from app.api.common import AsyncBaseResource
+from app.model import Didtx, Servicecount, ServiceStats
+from app.service import get_service_counts_async, get_did_request_did_v1, get_caller_did_async, \
+    check_did_request_v1, transaction_already_sent_v1_async, duplicate_result, check_daily_limit, new_didtx, \
+    count_didtx_created_async, created_result
+from app.service.async_mongo import async_mongo
+from app.service.async_sidechain_rpc import async_did_sidechain_rpc
+from app.errors import NotFoundError
+
+LOG = log.get_logger()
+
+
+class Create(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/didtx/create
+    """
+
+    async def on_post(self, req, res):
+        LOG.info(f'Enter /v1/didtx/create')
+        data = await req.get_media()
+        did_request = data["didRequest"]
+        did_request_did = get_did_request_did_v1(did_request)
+        caller_did = await get_caller_did_async(data, did_request_did, async_did_sidechain_rpc.resolve_did_v1, "v1")
+
+        # First verify whether this is a valid payload. Building the raw transaction calls the sidechain with
+        # requests, so it runs in the executor
+        await self.run_sync(check_did_request_v1, did_request_did, did_request)
+
+        # Check the number of times this did has used the "did_publish" service
+        servicecount_collection = async_mongo.get_collection(Servicecount)
+        counts = await get_service_counts_async(servicecount_collection, [caller_did, did_request_did],
+                                                config.SERVICE_DIDPUBLISH)
+
+        # Check if the row already exists with the same didRequest
+        collection = async_mongo.get_collection(Didtx)
+        confirmation_id = await transaction_already_sent_v1_async(collection, caller_did, did_request, data["memo"])
+        if confirmation_id:
+            self.on_success(res, duplicate_result(counts, confirmation_id))
+            return
+
+        check_daily_limit(counts, "v1")
+        row = new_didtx(data, caller_did, did_request_did, "1")
+        inserted = await collection.insert_one(row.to_mongo())
+        confirmation_id = str(inserted.inserted_id)
+        await count_didtx_created_async(collection, servicecount_collection, async_mongo.get_collection(ServiceStats),
+                                        confirmation_id, caller_did, did_request_did, data["requestFrom"])
+        self.on_success(res, created_result(counts, caller_did, confirmation_id))
+
+
+class ItemFromConfirmationId(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/didtx/confirmation_id/{confirmation_id}
+    """
+
+    async def on_get(self, req, res, confirmation_id):
+        LOG.info(f'Enter /v1/didtx/confirmation_id/{confirmation_id}')
+        try:
+            row = await async_mongo.get_collection(Didtx).find_one({"_id": ObjectId(confirmation_id)})
+        except (InvalidId, TypeError) as e:
+            LOG.info(f"Error /v1/didtx/id/{confirmation_id}: {str(e)}")
+            raise NotFoundError()
+        if not row:
+            LOG.info(f"Error /v1/didtx/id/{confirmation_id}")
+            raise NotFoundError()
+        self.on_success(res, Didtx._from_son(row).as_dict())
+
+
+class ItemFromDid(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/didtx/did/{did}
+    """
+
+    async def on_get(self, req, res, did):
+        LOG.info(f'Enter /v1/didtx/did/{did}')
+        rows = await async_mongo.get_collection(Didtx).find(
+            {"did": did.replace("did:elastos:", "").split("#")[0]}
+        ).sort("modified", -1).to_list(None)
+        if rows:
+            obj = [Didtx._from_son(row).as_dict() for row in rows]
+            self.on_success(res, obj)
+        else:
+            LOG.info(f"Error /v1/didtx/did/{did}")
+            raise NotFoundError()
+
+
+class RecentItemsFromDid(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/didtx/recent/did/{did}
+    """
+
+    async def on_get(self, req, res, did):
+        LOG.info(f'Enter /v1/didtx/recent/did/{did}')
+        rows = await async_mongo.get_collection(Didtx).find(
+            {"did": did.replace("did:elastos:", "").split("#")[0]}
+        ).sort("modified", -1).limit(5).to_list(None)
+        if rows:
+            obj = [Didtx._from_son(row).as_dict() for row in rows]
+            self.on_success(res, obj)
+        else:
+            LOG.info(f"Error /v1/didtx/recent/did/{did}")
+            raise NotFoundError()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app import log, config
+from app.api.common import AsyncBaseResource
+from app.model import Didtx, Servicecount, ServiceStats
+from app.service import get_service_counts_async, get_didtx_queue, prepare_did_request_v2, get_caller_did_async, \
+    transaction_already_sent_v2_async, duplicate_result, check_daily_limit, new_didtx, count_didtx_created_async, \
+    created_result, get_didtx_fields, get_didtx_projection, get_page_limit, get_page_query, get_page
+from app.service.async_mongo import async_mongo
+from app.service.async_sidechain_rpc import async_did_sidechain_rpc
+from app.errors import NotFoundError
+
+LOG = log.get_logger()
+
+
+class Create(AsyncBaseResource):
+    """
+    Handle for endpoint: /v2/didtx/create
+    """
+
+    async def on_post(self, req, res):
+        LOG.info(f'Enter /v2/didtx/create')
+        data = await req.get_media()
+        did_request = data["didRequest"]
+
+        # First verify whether this is a valid payload. The gas estimate calls the sidechain with requests, so it
+        # runs in the executor
+        if config.DID_REQUEST_OFFLINE_VALIDATION:
+            did_request_did, calldata, gas = prepare_did_request_v2(did_request)
+        else:
+            did_request_did, calldata, gas = await self.run_sync(prepare_did_request_v2, did_request)
+        caller_did = await get_caller_did_async(data, did_request_did, async_did_sidechain_rpc.resolve_did, "v2")
+
+        # Check the number of times this did has used the "did_publish" service
+        servicecount_collection = async_mongo.get_collection(Servicecount)
+        counts = await get_service_counts_async(servicecount_collection, [caller_did, did_request_did],
+                                                config.SERVICE_DIDPUBLISH)
+
+        # Check if the row already exists with the same didRequest
+        collection = async_mongo.get_collection(Didtx)
+        confirmation_id = await transaction_already_sent_v2_async(collection, caller_did, did_request, data["memo"],
+                                                                  calldata, gas)
+        if confirmation_id:
+            self.on_success(res, duplicate_result(counts, confirmation_id))
+            return
+
+        check_daily_limit(counts, "v2")
+        row = new_didtx(data, caller_did, did_request_did, "2", calldata, gas)
+        inserted = await collection.insert_one(row.to_mongo())
+        confirmation_id = str(inserted.inserted_id)
+        await self.run_sync(get_didtx_queue().put, confirmation_id)
+        await count_didtx_created_async(collection, servicecount_collection, async_mongo.get_collection(ServiceStats),
+                                        confirmation_id, caller_did, did_request_did, data["requestFrom"])
+        self.on_success(res, created_result(counts, caller_did, confirmation_id))
+
+
+class ItemFromConfirmationId(AsyncBaseResource):
+    """
+    Handle for endpoint: /v2/didtx/confirmation_id/{confirmation_id}
+    """
+
+    async def on_get(self, req, res, confirmation_id):
+        LOG.info(f'Enter /v2/didtx/confirmation_id/{confirmation_id}')
+        try:
+            row = await async_mongo.get_collection(Didtx).find_one({"_id": ObjectId(confirmation_id)})
+        except (InvalidId, TypeError) as e:
+            LOG.info(f"Error /v2/didtx/id/{confirmation_id}: {str(e)}")
+            raise NotFoundError()
+        if not row:
+            LOG.info(f"Error /v2/didtx/id/{confirmation_id}")
+            raise NotFoundError()
+        self.on_success(res, Didtx._from_son(row).as_dict())
+
+
+class ItemFromDid(AsyncBaseResource):
+    """
+    Handle for endpoint: /v2/didtx/did/{did}
+
+    Takes the same query parameters as the sync resource
+    """
+
+    async def on_get(self, req, res, did):
+        LOG.info(f'Enter /v2/didtx/did/{did}')
+        did = did.replace("did:elastos:", "").split("#")[0]
+        fields = get_didtx_fields(req.get_param("summary"), req.get_param("fields"))
+        limit = req.get_param("limit")
+        after = req.get_param("after")
+
+        collection = async_mongo.get_collection(Didtx)
+        projection = get_didtx_projection(fields)
+
+        if limit is None and after is None:
+            rows = await collection.find({"did": did}, projection).sort("modified", -1).to_list(None)
+            if rows:
+                obj = [Didtx._from_son(row).as_dict(fields) for row in rows]
+                self.on_success(res, obj)
+            else:
+                LOG.info(f"Error /v2/didtx/did/{did}")
+                raise NotFoundError()
+            return
+
+        limit = get_page_limit(limit)
+        page = await collection.find(get_page_query(did, after), projection).sort("_id", -1).limit(limit + 1) \
+            .to_list(None)
+        if not page and after is None:
+            LOG.info(f"Error /v2/didtx/did/{did}")
+            raise NotFoundError()
+        self.on_success(res, get_page(page, limit, fields, await collection.count_documents({"did": did})))
+
+
+class RecentItemsFromDid(AsyncBaseResource):
+    """
+    Handle for endpoint: /v2/didtx/recent/did/{did}
+    """
+
+    async def on_get(self, req, res, did):
+        LOG.info(f'Enter /v2/didtx/recent/did/{did}')
+        rows = await async_mongo.get_collection(Didtx).find(
+            {"did": did.replace("did:elastos:", "").split("#")[0]}
+        ).sort("modified", -1).limit(5).to_list(None)
+        if rows:
+            obj = [Didtx._from_son(row).as_dict() for row in rows]
+            self.on_success(res, obj)
+        else:
+            LOG.info(f"Error /v2/didtx/recent/did/{did}")
+            raise NotFoundError()
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from app import log
+from app.api.common import AsyncBaseResource
+from app.model import Servicecount
+from app.service import get_service_count, get_did_service_count_async
+from app.service.async_mongo import async_mongo
+
+LOG = log.get_logger()
+
+
+class GetServiceCountSpecificDidAndService(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/service_count/{service}/{did}
+    """
+
+    async def on_get(self, req, res, service, did):
+        LOG.info(f'Enter /v1/service_count/{service}/{did}')
+        obj = await get_did_service_count_async(async_mongo.get_collection(Servicecount), did, service)
+        self.on_success(res, obj)
+
+
+class GetServiceCountAllServices(AsyncBaseResource):
+    """
+    Handle for endpoint: /v1/service_count/statistics
+    """
+
+    async def on_get(self, req, res):
+        LOG.info(f'Enter /v1/service_count/statistics')
+        # The aggregation goes through pymongo, so it runs in the executor
+        result = await self.run_sync(get_service_count)
+        self.on_success(res, result)
@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-from .base import BaseResource
\ No newline at end of file
+from .base import BaseResource, AsyncBaseResource
\ No newline at end of file
@@ -1,54 +1,89 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import datetime
 import falcon
+import functools
 import json
 
+from bson import ObjectId
+
 try:
-    from collections import OrderedDict
+    import orjson
 except ImportError:
-    OrderedDict = dict
+    orjson = None
 
 from app import log
-from app.config import BRAND_NAME, MONGO
+from app.config import BRAND_NAME, MONGO, JSON_SERIALIZER
 from app.errors import NotFoundError
 
 LOG = log.get_logger()
 
 
+def json_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StdlibJsonSerializer(object):
+    name = "stdlib"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=json_default).encode("utf-8")
+
+
+class OrjsonSerializer(object):
+    name = "orjson"
+
+    def dumps(self, obj):
+        # orjson handles datetime natively and falls back to json_default for ObjectId
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def get_serializer(name=JSON_SERIALIZER):
+    if name == "stdlib":
+        return StdlibJsonSerializer()
+    if orjson is None:
+        if name == "orjson":
+            LOG.info("orjson is not installed, falling back to the stdlib json serializer")
+        return StdlibJsonSerializer()
+    return OrjsonSerializer()
+
+
 class BaseResource(object):
     HELLO_WORLD = {
         "server": "%s" % BRAND_NAME,
         "database": "mongo: (%s)" % (MONGO["HOST"]),
     }
 
+    serializer = get_serializer()
+
     def to_json(self, body_dict):
-        return json.dumps(body_dict)
+        return self.serializer.dumps(body_dict)
 
     def on_error(self, res, error=None):
         res.status = error["status"]
-        meta = OrderedDict()
-        meta["code"] = error["code"]
-        meta["message"] = error["message"]
-
-        obj = OrderedDict()
-        obj["meta"] = meta
-        res.body = self.to_json(obj)
+        meta = {
+            "code": error["code"],
+            "message": error["message"]
+        }
+        res.data = self.to_json({"meta": meta})
 
     def on_success(self, res, data=None):
         res.status = falcon.HTTP_200
-        meta = OrderedDict()
-        meta["code"] = 200
-        meta["message"] = "OK"
-
-        obj = OrderedDict()
-        obj["meta"] = meta
-        obj["data"] = data
-        res.body = self.to_json(obj)
+        meta = {
+            "code": 200,
+            "message": "OK"
+        }
+        res.data = self.to_json({"meta": meta, "data": data})
 
     def on_get(self, req, res):
         if req.path == "/":
             res.status = falcon.HTTP_200
-            res.body = self.to_json(self.HELLO_WORLD)
+            res.data = self.to_json(self.HELLO_WORLD)
         else:
             raise NotFoundError(method="GET", url=req.path)
 
@@ -59,4 +94,27 @@ class BaseResource(object):
         raise NotFoundError(method="PUT", url=req.path)
 
     def on_delete(self, req, res):
-        raise NotFoundError(method="DELETE", url=req.path)
\ No newline at end of file
+        raise NotFoundError(method="DELETE", url=req.path)
+
+
+class AsyncBaseResource(BaseResource):
+    """
+    BaseResource of the ASGI app, where the responders have to be coroutines
+    """
+
+    @staticmethod
+    async def run_sync(func, *args, **kwargs):
+        # Runs a blocking call in the default executor so it doesn't hold up the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def on_get(self, req, res):
+        BaseResource.on_get(self, req, res)
+
+    async def on_post(self, req, res):
+        BaseResource.on_post(self, req, res)
+
+    async def on_put(self, req, res):
+        BaseResource.on_put(self, req, res)
+
+    async def on_delete(self, req, res):
+        BaseResource.on_delete(self, req, res)
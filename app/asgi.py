@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# ASGI build of the API server. It serves the same endpoints as app.wsgi:application with coroutine resources:
+#   gunicorn -k uvicorn.workers.UvicornWorker app.asgi:application
+import falcon.asgi
+
+from app import log
+from app.db import mongo
+from app.api.asgi import didtx, didtxv2, did_document, servicecount
+from app.api.common import AsyncBaseResource
+from app.errors import AppError
+from app.middleware import AuthMiddleware, RateLimitMiddleware
+from app.service.async_mongo import async_mongo
+from app.service.async_sidechain_rpc import async_did_sidechain_rpc
+
+LOG = log.get_logger()
+
+
+class AsyncClientsMiddleware(object):
+    async def process_shutdown(self, scope, event):
+        LOG.info("Closing the async clients...")
+        async_mongo.close()
+        await async_did_sidechain_rpc.close()
+
+
+class AsgiApp(falcon.asgi.App):
+    def __init__(self, *args, **kwargs):
+        super(AsgiApp, self).__init__(*args, **kwargs)
+        # Falcon 3 stopped ignoring the trailing slash of the path by default, keep routing like Falcon 2 did
+        self.req_options.strip_url_path_trailing_slash = True
+        LOG.info("ASGI API Server is starting")
+
+        self.add_route("/", AsyncBaseResource())
+
+        self.add_route("/v1/didtx/create", didtx.Create())
+        self.add_route("/v2/didtx/create", didtxv2.Create())
+
+        self.add_route("/v1/didtx/confirmation_id/{confirmation_id}", didtx.ItemFromConfirmationId())
+        self.add_route("/v2/didtx/confirmation_id/{confirmation_id}", didtxv2.ItemFromConfirmationId())
+
+        self.add_route("/v1/didtx/did/{did}", didtx.ItemFromDid())
+        self.add_route("/v2/didtx/did/{did}", didtxv2.ItemFromDid())
+
+        self.add_route("/v1/didtx/recent/did/{did}", didtx.RecentItemsFromDid())
+        self.add_route("/v2/didtx/recent/did/{did}", didtxv2.RecentItemsFromDid())
+
+        self.add_route("/v1/documents/did/{did}", did_document.GetDidDocumentsFromDid())
+        self.add_route("/v1/documents/crypto_name/{crypto_name}", did_document.GetDidDocumentsFromCryptoname())
+
+        self.add_route("/v1/service_count/{service}/{did}", servicecount.GetServiceCountSpecificDidAndService())
+        self.add_route("/v1/service_count/statistics", servicecount.GetServiceCountAllServices())
+
+        self.add_error_handler(AppError, AppError.handle_async)
+
+
+def create_app():
+    # The endpoints that are still blocking, the rate limiter and the DID resolution cache use pymongo
+    mongo.connect()
+
+    LOG.info("Initializing the Falcon ASGI API service...")
+    return AsgiApp(middleware=[
+        AuthMiddleware(),
+        RateLimitMiddleware(),
+        AsyncClientsMiddleware(),
+    ])
+
+
+application = create_app()
@@ -17,9 +17,55 @@ DEBUG = True
 
 CRON_INTERVAL = config('CRON_INTERVAL', default=100, cast=int)
 CRON_INTERVAL_V2 = config('CRON_INTERVAL_V2', default=8, cast=int)
+# Refresh of the cached DID documents run every CRON_INTERVAL. Unchanged documents are checked again after MAX_AGE
+# seconds, at most BATCH_SIZE DIDs are resolved per run in WORKERS concurrent batches, and a document that couldn't
+# be refreshed is retried after RETRY_DELAY seconds, doubled on each failure
+DID_DOCUMENT_REFRESH_MAX_AGE = config('DID_DOCUMENT_REFRESH_MAX_AGE', default=3600, cast=int)
+DID_DOCUMENT_REFRESH_BATCH_SIZE = config('DID_DOCUMENT_REFRESH_BATCH_SIZE', default=500, cast=int)
+DID_DOCUMENT_REFRESH_WORKERS = config('DID_DOCUMENT_REFRESH_WORKERS', default=4, cast=int)
+DID_DOCUMENT_REFRESH_RETRY_DELAY = config('DID_DOCUMENT_REFRESH_RETRY_DELAY', default=60, cast=int)
+# Seconds the cron worker holding the leader lock keeps it without renewing it before another worker takes over
+LEADER_LOCK_TTL = config('LEADER_LOCK_TTL', default=30, cast=int)
+# Seconds between two recomputations of the pre-aggregated service statistics from the didtx collection
+SERVICE_STATS_RECONCILE_INTERVAL = config('SERVICE_STATS_RECONCILE_INTERVAL', default=3600, cast=int)
 
 REQUEST_TIMEOUT = 30
 
+# Keep-alive connection pool used for the DID sidechain RPC
+RPC_POOL_CONNECTIONS = config('RPC_POOL_CONNECTIONS', default=10, cast=int)  # Number of hosts kept in the pool
+RPC_POOL_MAXSIZE = config('RPC_POOL_MAXSIZE', default=20, cast=int)  # Max open connections per host
+# Wait for a free connection instead of opening more
+RPC_POOL_BLOCK = config('RPC_POOL_BLOCK', default=False, cast=bool)
+RPC_CONNECT_TIMEOUT = config('RPC_CONNECT_TIMEOUT', default=5, cast=float)
+RPC_READ_TIMEOUT = config('RPC_READ_TIMEOUT', default=REQUEST_TIMEOUT, cast=float)
+RPC_MAX_BATCH_SIZE = config('RPC_MAX_BATCH_SIZE', default=50, cast=int)  # Max calls per JSON-RPC batch request
+
+# How the API hands the new v2 transactions to the worker: "auto" uses a change stream on a replica set and a capped
+# collection otherwise, "change_stream", "capped" or "memory" for an API and a worker running in the same process
+DIDTX_QUEUE = config('DIDTX_QUEUE', default="auto", cast=str)
+DIDTX_QUEUE_CAPPED_SIZE = config('DIDTX_QUEUE_CAPPED_SIZE', default=1048576, cast=int)  # Bytes
+
+# Seconds between two checks for a new block of the DID sidechain, about its block time. The CRON_INTERVAL_V2 job
+# only runs while the watcher hasn't polled successfully for BLOCK_WATCHER_MAX_SILENCE seconds
+BLOCK_WATCHER_POLL_INTERVAL = config('BLOCK_WATCHER_POLL_INTERVAL', default=5.0, cast=float)
+BLOCK_WATCHER_MAX_SILENCE = config('BLOCK_WATCHER_MAX_SILENCE', default=30.0, cast=float)
+
+# Gas price of the DID sidechain kept in memory, fetched once per new block
+# Seconds before the price is fetched on the spot
+GAS_ORACLE_MAX_AGE = config('GAS_ORACLE_MAX_AGE', default=30.0, cast=float)
+GAS_PRICE_MIN_GWEI = config('GAS_PRICE_MIN_GWEI', default=0.0, cast=float)  # 0 for no floor
+GAS_PRICE_MAX_GWEI = config('GAS_PRICE_MAX_GWEI', default=100.0, cast=float)  # 0 for no ceiling
+
+# Gas limit learned from the receipts of the published transactions, per operation and calldata size bucket
+GAS_ESTIMATOR_BUCKET_SIZE = config('GAS_ESTIMATOR_BUCKET_SIZE', default=256, cast=int)  # Bytes of calldata per bucket
+GAS_ESTIMATOR_MIN_SAMPLES = config('GAS_ESTIMATOR_MIN_SAMPLES', default=3, cast=int)  # Receipts before estimating
+GAS_ESTIMATOR_MARGIN = config('GAS_ESTIMATOR_MARGIN', default=0.2, cast=float)  # Added on top of the learned gas
+# Max ratio between the gas per byte of two samples of a bucket
+GAS_ESTIMATOR_MAX_SPREAD = config('GAS_ESTIMATOR_MAX_SPREAD', default=1.5, cast=float)
+
+# Seconds a transaction sent to the DID sidechain is waited for before it counts as a timeout
+RECEIPT_TIMEOUT = config('RECEIPT_TIMEOUT', default=30, cast=float)
+
 MONGO = {
     "DATABASE": config('MONGO_DATABASE', default="assistdb", cast=str),
     "HOST": config('MONGO_HOST', default="localhost", cast=str),
@@ -50,6 +96,9 @@ DID_SIDECHAIN_RPC_URL_ETH = config('DID_SIDECHAIN_RPC_URL_ETH', default="https:/
                                    cast=str)
 DID_CONTRACT_ADDRESS = config('DID_CONTRACT_ADDRESS', default="0x46E5936a9bAA167b3368F4197eDce746A66f7a7a", cast=str)
 DID_CHAIN_ID = config('DID_CHAIN_ID', default=22, cast=int)
+# Validate didRequests locally on /v2/didtx/create. The gas estimate against the DID sidechain is then only done
+# when the transaction is submitted
+DID_REQUEST_OFFLINE_VALIDATION = config('DID_REQUEST_OFFLINE_VALIDATION', default=True, cast=bool)
 
 # Service Types
 SERVICE_DIDPUBLISH = "did_publish"
@@ -98,6 +147,10 @@ NUM_WALLETS = len(WALLETS)
 WALLETSV2 = get_walletsV2()
 NUM_WALLETSV2 = len(WALLETSV2)
 WALLETSV2_PASS = config('WALLET_ETH_PASS', default="", cast=str)
+# Max transactions sent from the same wallet per block, each with the next nonce
+WALLETSV2_MAX_TX_PER_BLOCK = config('WALLET_ETH_MAX_TX_PER_BLOCK', default=5, cast=int)
+# Decrypt all the wallet keystores when the cron worker starts instead of on first use
+WALLETSV2_PRELOAD_KEYS = config('WALLET_ETH_PRELOAD_KEYS', default=False, cast=bool)
 
 EMAIL = {
     "SENDER": config('EMAIL_SENDER', default="test@test.com", cast=str),
@@ -110,8 +163,30 @@ EMAIL = {
 
 SLACK_TOKEN = config('SLACK_TOKEN', default="slack-token", cast=str)
 
-# Rate limit for creating/updating DIDs(100 calls per minute)
-RATE_LIMIT_CREATE_DID = 1000
-# Rate limit for all other APIs(10K calls per minute)
-RATE_LIMIT_CALLS = 10000
-RATE_LIMIT_PERIOD = 60
+# Page size of /v2/didtx/did/{did} when paging through the transactions of a DID
+DIDTX_PAGE_DEFAULT_LIMIT = config('DIDTX_PAGE_DEFAULT_LIMIT', default=20, cast=int)
+DIDTX_PAGE_MAX_LIMIT = config('DIDTX_PAGE_MAX_LIMIT', default=100, cast=int)
+
+# Cache of the documents resolved from the DID sidechain. DIDs that don't exist are cached for NEGATIVE_TTL seconds.
+# SHARED also keeps the entries in MongoDB for all the processes. Each process drops the entries of the DIDs whose
+# transaction completed at most every INVALIDATION_INTERVAL seconds
+DID_RESOLUTION_CACHE_TTL = config('DID_RESOLUTION_CACHE_TTL', default=300, cast=int)
+DID_RESOLUTION_CACHE_NEGATIVE_TTL = config('DID_RESOLUTION_CACHE_NEGATIVE_TTL', default=30, cast=int)
+DID_RESOLUTION_CACHE_SIZE = config('DID_RESOLUTION_CACHE_SIZE', default=10000, cast=int)
+DID_RESOLUTION_CACHE_SHARED = config('DID_RESOLUTION_CACHE_SHARED', default=False, cast=bool)
+DID_RESOLUTION_CACHE_INVALIDATION_INTERVAL = config('DID_RESOLUTION_CACHE_INVALIDATION_INTERVAL', default=1,
+                                                    cast=float)
+
+# JSON encoder of the API responses: "auto" uses orjson when it's installed, otherwise "orjson" or "stdlib"
+JSON_SERIALIZER = config('JSON_SERIALIZER', default="auto", cast=str)
+
+# Rate limit per client for creating/updating DIDs(1000 calls per minute)
+RATE_LIMIT_CREATE_DID = config('RATE_LIMIT_CREATE_DID', default=1000, cast=int)
+# Rate limit per client for all other APIs(10K calls per minute)
+RATE_LIMIT_CALLS = config('RATE_LIMIT_CALLS', default=10000, cast=int)
+RATE_LIMIT_PERIOD = config('RATE_LIMIT_PERIOD', default=60, cast=int)
+# Where the calls are counted: "mongo" shares the limits between all the processes, "local" counts per process
+RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default="mongo", cast=str)
+# Number of proxies in front of the API that append the address they got the call from to X-Forwarded-For, the
+# load balancer by default. The client is the entry added by the first of them; 0 uses the address of the connection
+RATE_LIMIT_TRUSTED_PROXIES = config('RATE_LIMIT_TRUSTED_PROXIES', default=1, cast=int)
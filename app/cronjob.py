@@ -5,15 +5,13 @@ import sys
 import json
 from datetime import datetime
 
-from pymongo import MongoClient
-
 from app import log, config
 
 from app.model import Didtx, DidDocument, Servicecount
 from app.model import Didstate
 
 from app.service import DidPublish, DidSidechainRpc, get_service_count, get_didtx_count, send_email, \
-    send_slack_notification
+    send_slack_notification, record_didtx_status_changes
 
 LOG = log.get_logger()
 
@@ -83,6 +81,7 @@ def cron_send_tx_to_did_sidechain():
                     "reason": "Was in pending state for more than 1 hour"
                 }
                 row.save()
+                record_didtx_status_changes([(config.SERVICE_STATUS_PENDING, row.status)])
                 continue
             tx = did_publish.create_raw_transaction(row.did, row.didRequest)
             if not tx:
@@ -120,6 +119,7 @@ def cron_send_tx_to_did_sidechain():
                                                       f"Error: {str(row.extraInfo)}"
                     send_slack_notification(slack_blocks)
                 row.save()
+                record_didtx_status_changes([(config.SERVICE_STATUS_PENDING, row.status)])
 
         # Get info about all the transactions and save them to the database
         rows_processing = Didtx.objects(status=config.SERVICE_STATUS_PROCESSING, version="1")
@@ -135,6 +135,7 @@ def cron_send_tx_to_did_sidechain():
                     row.status = config.SERVICE_STATUS_COMPLETED
                     row.blockchainTx["result"]["confirmations"] = "2+"
             row.save()
+            record_didtx_status_changes([(config.SERVICE_STATUS_PROCESSING, row.status)])
 
         # Try to process quarantined transactions one at a time
         rows_quarantined = Didtx.objects(status=config.SERVICE_STATUS_QUARANTINE, version="1")
@@ -202,6 +203,7 @@ def binary_split_resend(rows_quarantined):
                              "address"] + " to the blockchain for id: " + str(
                     row.id) + " DID: " + row.did + " tx_id: " + tx_id)
                 row.save()
+                record_didtx_status_changes([(config.SERVICE_STATUS_QUARANTINE, row.status)])
         else:
             # If the transaction failed, make sure to switch to a different wallet
             did_publish.current_wallet_index += 1
@@ -1,22 +1,29 @@
 # -*- coding: utf-8 -*-
 import sys
 import json
+import threading
 from datetime import datetime
-from pymongo import MongoClient
-import multiprocessing
+from pymongo import UpdateOne
 
 from app import log, config
+from app.db import mongo
 
 from app.model import Didtx, DidDocument, Servicecount
 from app.model import Didstate
 
 from app.service import Web3DidAdapter, DidSidechainRpcV2, get_service_count, get_didtx_count, send_email, \
-    send_slack_notification
+    send_slack_notification, sidechain_connection_pool, receipt_tracker, WalletScheduler, \
+    did_resolution_cache, DidDocumentRefresher, record_didtx_status_changes
 
 LOG = log.get_logger()
 
 web3_did = Web3DidAdapter()
 did_sidechain_rpc = DidSidechainRpcV2()
+wallet_scheduler = WalletScheduler()
+did_document_refresher = DidDocumentRefresher()
+# Transactions are sent both by the cron job and as soon as they are queued, never at the same time so the nonces of
+# the wallets are handed out in order
+submit_lock = threading.Lock()
 
 
 def cron_send_daily_stats_v2():
@@ -43,7 +50,9 @@ def cron_send_daily_stats_v2():
     wallets_stats = "<table><tr><th>Address</th><th>Balance</th><th>Type</th></tr>"
     # Used for testing purposes
     test_address = "0x365b70f14e10b02bef7e463eca6aa3e75ca3cdb1"
-    test_balance = "{:.4f}".format(did_sidechain_rpc.get_balance(test_address))
+    wallet_addresses = [f"0x{json.loads(wallet)['address']}" for wallet in config.WALLETSV2]
+    balances = did_sidechain_rpc.get_balances([test_address] + wallet_addresses)
+    test_balance = "{:.4f}".format(balances[test_address])
     wallets_stats += f"<tr><td>{test_address}</td><td>{test_balance}</td><td>Testing</td></tr>"
     slack_blocks.append({
         "type": "section",
@@ -54,7 +63,7 @@ def cron_send_daily_stats_v2():
     })
     for wallet in config.WALLETSV2:
         address = json.loads(wallet)["address"]
-        balance = "{:.4f}".format(did_sidechain_rpc.get_balance(f"0x{address}"))
+        balance = "{:.4f}".format(balances[f"0x{address}"])
         wallets_stats += f"<tr><td>0x{address}</td><td>{balance}</td><td>Production</td></tr>"
         slack_blocks[2]["text"]["text"] += f"{address} | {balance} | Production\n"
     wallets_stats += "</table>"
@@ -150,45 +159,41 @@ def cron_send_daily_stats_v2():
         send_email(to_email, subject, content_html)
         send_slack_notification(slack_blocks)
     cron_reset_didpublish_daily_limit()
+    LOG.info(f"Mongo connection pool: {mongo.pool_stats()}")
     LOG.info('Completed cron job: cron_send_daily_stats')
 
 
 def cron_reset_didpublish_daily_limit():
     LOG.info('Started cron job: reset_didpublish_daily_limit')
-    mongo_client = MongoClient(config.MONGO_CONNECT_HOST)
-    db = mongo_client.get_database(config.MONGO["DATABASE"])
-
-    result = db.servicecount.aggregate([
-        {"$match": {"data.did_publish.count": {"$gt": 0}}},
-        {"$group": {"_id": "$did"}},
-        {"$project": {"_id": 0, "did": "$_id"}}
-    ])
-
-    for r in result:
-        rows = Servicecount.objects(did=r["did"])
-        row = rows[0]
-        if config.SERVICE_DIDPUBLISH in row.data.keys():
-            row.data["did_publish"]["count"] = 0
-            row.save()
-    LOG.info('Completed cron job: reset_didpublish_daily_limit')
+    count_field = f"data.{config.SERVICE_DIDPUBLISH}.count"
+    result = mongo.get_collection(Servicecount).update_many(
+        {count_field: {"$gt": 0}},
+        {"$set": {count_field: 0, "modified": datetime.utcnow()}}
+    )
+    LOG.info(f'Completed cron job: reset_didpublish_daily_limit: {result.modified_count} DIDs reset')
 
 
 def cron_update_recent_did_documents():
     LOG.info('Started cron job: update_recent_did_documents')
-    rows = DidDocument.objects()
-    for row in rows:
-        time_since_last_searched = datetime.utcnow() - row.last_searched
-        # Remove DIDs from the database that no one has searched for the last 90 days
-        if (time_since_last_searched.total_seconds() / (60.0 * 60.0 * 24.0)) > 90:
-            LOG.info(f"The DID '{row.did}' has not been searched for the last 90 days. Removing from the database to "
-                     f"save some space")
-            row.delete()
-        else:
-            row.documents = did_sidechain_rpc.get_documents_specific_did(row.did)
-            row.save()
+    did_document_refresher.refresh()
     LOG.info('Completed cron job: update_recent_did_documents')
 
 
+def warm_up_gas_estimator(limit=500):
+    """
+    Feeds the receipts of the last published transactions to the gas estimator
+    """
+    rows = Didtx._get_collection().find(
+        {"status": config.SERVICE_STATUS_COMPLETED, "version": "2", "blockchainTx.gasUsed": {"$exists": True}},
+        {"didRequest": 1, "calldata": 1, "blockchainTx.gasUsed": 1, "blockchainTx.status": 1}
+    ).sort("modified", -1).limit(limit)
+    for row in rows:
+        try:
+            web3_did.observe_receipt(row["didRequest"], row["blockchainTx"], row.get("calldata"))
+        except Exception as e:
+            LOG.info(f"Could not learn the gas used by transaction {row['_id']}: {str(e)}")
+
+
 def cron_send_tx_to_did_sidechain_v2():
     current_time = datetime.utcnow().strftime("%a, %b %d, %Y @ %I:%M:%S %p")
     LOG.info('Started cron job: cron_send_tx_to_did_sidechain_v2')
@@ -199,7 +204,7 @@ def cron_send_tx_to_did_sidechain_v2():
             LOG.info("DID sidechain is currently not reachable...")
             return
 
-        rows_pending = Didtx.objects(status=config.SERVICE_STATUS_PENDING, version='2')
+        rows_pending = Didtx.objects(status=config.SERVICE_STATUS_PENDING, version='2').order_by('created')
         rows_processing = Didtx.objects(status=config.SERVICE_STATUS_PROCESSING, version='2')
         LOG.info(f"rows pending {len(rows_pending)}")
 
@@ -223,44 +228,18 @@ def cron_send_tx_to_did_sidechain_v2():
             row.save()
             return
 
-        slack_blocks = [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": ""
-                }
-            },
-            {
-                "type": "divider"
-            },
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": ""
-                }
-            },
-            {
-                "type": "divider"
-            }
-        ]
-
-        # Create raw transactions
-        if len(rows_pending) > config.NUM_WALLETSV2:
-            rows_pending = rows_pending[:config.NUM_WALLETSV2]
-        wallets = config.WALLETSV2
+        slack_blocks = new_slack_blocks()
 
-        for index, row in enumerate(list(rows_pending)):
-            process_pending_tx(wallets[index], row, slack_blocks, current_time)
+        # Create raw transactions. Each wallet can send several transactions per block using sequential nonces
+        with submit_lock:
+            wallet_scheduler.new_block()
+            if len(rows_pending) > 0:
+                wallet_scheduler.sync()
+                for wallet, row in wallet_scheduler.schedule(list(rows_pending[:wallet_scheduler.capacity])):
+                    process_pending_tx(wallet, row, slack_blocks, current_time)
 
-        rows_processing = Didtx.objects(status=config.SERVICE_STATUS_PROCESSING, version='2')
-        LOG.info(f"rows processing {len(rows_processing)}")
-        pool = multiprocessing.Pool()
-        for row in rows_processing:
-            pool.apply_async(process_processing_tx, args=(row.id, slack_blocks, current_time,))
-        pool.close()
-        pool.join()
+        process_processing_txs(slack_blocks, current_time)
+        LOG.info(f"DID sidechain connection pool: {sidechain_connection_pool.get_stats()}")
         LOG.info('Completed cron job: send_tx_to_did_sidechain_v2')
 
     except Exception as err:
@@ -269,23 +248,77 @@ def cron_send_tx_to_did_sidechain_v2():
         message += "Unexpected error: " + str(exc_type) + "\n"
         message += ' File "' + exc_tb.tb_frame.f_code.co_filename + '", line ' + str(exc_tb.tb_lineno) + "\n"
         LOG.info(f"Error while running cron job: {message}")
+        slack_blocks = new_slack_blocks()
         slack_blocks[0]["text"]["text"] = f"Error while sending tx to the blockchain at {current_time}"
         slack_blocks[2]["text"]["text"] = f"Error: {message}"
         send_slack_notification(slack_blocks)
 
 
+def dispatch_didtx(confirmation_id):
+    """
+    Sends a transaction as soon as it's queued by the API if the wallets have slots left in the current block.
+    Otherwise it stays Pending until cron_send_tx_to_did_sidechain_v2 runs for the next block
+    """
+    current_time = datetime.utcnow().strftime("%a, %b %d, %Y @ %I:%M:%S %p")
+    with submit_lock:
+        row = Didtx.objects(id=confirmation_id, status=config.SERVICE_STATUS_PENDING, version='2').first()
+        if not row:
+            return
+        if not wallet_scheduler.synced:
+            # The cron job hasn't run yet so the nonces are not known
+            wallet_scheduler.sync()
+        for wallet, row in wallet_scheduler.schedule([row]):
+            LOG.info(f"Sending the queued transaction {confirmation_id}")
+            process_pending_tx(wallet, row, new_slack_blocks(), current_time)
+
+
+def new_slack_blocks():
+    return [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        },
+        {
+            "type": "divider"
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": ""
+            }
+        },
+        {
+            "type": "divider"
+        }
+    ]
+
+
 def process_pending_tx(wallet, row, slack_blocks, current_time):
     address = json.loads(wallet)["address"]
     row.walletUsed = f"0x{address}"
 
-    nonce = web3_did.increment_nonce(address)
-    tx, err_message = web3_did.create_transaction(wallet, nonce, row.didRequest)
+    nonce = wallet_scheduler.get_nonce(row.walletUsed)
+    if nonce is None:
+        LOG.info(f"Nonce of wallet 0x{address} is unknown. Leaving id {row.id} in Pending state")
+        return
+    if row.calldata:
+        # Prepared by the API when the transaction was created
+        tx, err_message = web3_did.sign_transaction(wallet, nonce, row.calldata, row.gas,
+                                                    web3_did.get_operation(row.didRequest))
+    else:
+        tx, err_message = web3_did.create_transaction(wallet, nonce, row.didRequest, learned_gas=True)
     if err_message:
-        err_message = f"Could not generate a valid transaction out of the given didRequest. Error Message: {err_message}"
+        err_message = f"Could not generate a valid transaction out of the given didRequest. " \
+                      f"Error Message: {err_message}"
         LOG.info(f"Error: {err_message}")
         row.status = config.SERVICE_STATUS_REJECTED
         row.extraInfo = {"error": err_message}
         row.save()
+        record_didtx_status_changes([(config.SERVICE_STATUS_PENDING, row.status)])
         slack_blocks[0]["text"][
             "text"] = f"The following transaction was rejected at {current_time}"
         slack_blocks[2]["text"]["text"] = f"Wallet used: 0x{address}\n" \
@@ -298,9 +331,12 @@ def process_pending_tx(wallet, row, slack_blocks, current_time):
 
     tx_response = did_sidechain_rpc.send_raw_transaction(tx)
     if tx_response["error"]:
+        # The nonce may not have been used, get it from the chain again before the next transaction of this wallet
+        wallet_scheduler.resync(row.walletUsed)
         row.extraInfo = {"error": tx_response["error"]}
         row.status = config.SERVICE_STATUS_REJECTED
         row.save()
+        record_didtx_status_changes([(config.SERVICE_STATUS_PENDING, row.status)])
         LOG.info("Pending: Error sending transaction from wallet: 0x" +
                  address + " for id: " + str(row.id) + " DID:" + row.did +
                  " Error: " + str(row.extraInfo))
@@ -312,67 +348,87 @@ def process_pending_tx(wallet, row, slack_blocks, current_time):
                                           f"Error: {str(row.extraInfo)}"
         send_slack_notification(slack_blocks)
         return
+    wallet_scheduler.increment(row.walletUsed)
     row.blockchainTxId = tx_response["tx_id"]
     row.status = config.SERVICE_STATUS_PROCESSING
     row.save()
-
-
-def process_processing_tx(row_id, slack_blocks, current_time):
-    mongo_client = MongoClient(config.MONGO_CONNECT_HOST)
-    db = mongo_client.get_database(config.MONGO["DATABASE"])
-    col = db["didtx"]
-    filter_info = {
-        "_id": row_id
-    }
-    update_info = {
-        "$set": {}
-    }
-    row = col.find_one(filter_info)
-    result = did_sidechain_rpc.wait_for_transaction_receipt(row['blockchainTxId'])
-    tx_receipt, err_type, err_message = result["tx_receipt"], result["err_type"], result["err_message"]
-    if tx_receipt:
-        update_info["$set"]["blockchainTx"] = tx_receipt
-        if "status" in tx_receipt.keys() and tx_receipt["status"] == 1:
-            update_info["$set"]["status"] = config.SERVICE_STATUS_COMPLETED
-            update_info["$set"]["extraInfo"] = {}
-            update_info["$set"]["numTimeout"] = 0
-        else:
-            update_info["$set"]["status"] = config.SERVICE_STATUS_REJECTED
-            LOG.info("Pending: Error sending transaction:b" + " for id: " + str(row['id']) + " DID:" + row['did'] +
-                     " Error: " + str(row['extraInfo']))
-    else:
-        error = err_message
-        update_info["$set"]["extraInfo"] = {
-            "error": error
+    record_didtx_status_changes([(config.SERVICE_STATUS_PENDING, row.status)])
+
+
+def process_processing_txs(slack_blocks, current_time):
+    col = Didtx._get_collection()
+    rows = list(col.find(
+        {"status": config.SERVICE_STATUS_PROCESSING, "version": "2"},
+        {"did": 1, "didRequestDid": 1, "didRequest": 1, "calldata": 1, "blockchainTxId": 1, "numTimeout": 1,
+         "modified": 1}
+    ))
+    LOG.info(f"rows processing {len(rows)}")
+    # A row is modified when it's sent and on each timeout, so that's when its current wait started
+    results = receipt_tracker.check_receipts({row["blockchainTxId"]: row.get("modified") or datetime.utcnow()
+                                              for row in rows})
+
+    updates = []
+    status_changes = []
+    completed_dids = set()
+    for row in rows:
+        update_info = {
+            "$set": {
+                "modified": datetime.utcnow()
+            }
         }
-        if err_type == "TimeExhausted":
-            if row['numTimeout'] > 5:
+        result = results.get(row["blockchainTxId"])
+        if not result:
+            # No receipt yet, the row is checked again on the next block
+            continue
+        tx_receipt, err_type, err_message = result["tx_receipt"], result["err_type"], result["err_message"]
+        if tx_receipt:
+            update_info["$set"]["blockchainTx"] = tx_receipt
+            web3_did.observe_receipt(row["didRequest"], tx_receipt, row.get("calldata"))
+            if "status" in tx_receipt.keys() and tx_receipt["status"] == 1:
+                update_info["$set"]["status"] = config.SERVICE_STATUS_COMPLETED
+                update_info["$set"]["extraInfo"] = {}
+                update_info["$set"]["numTimeout"] = 0
+                completed_dids.update([row["did"], row.get("didRequestDid")])
+            else:
+                update_info["$set"]["status"] = config.SERVICE_STATUS_REJECTED
+                LOG.info("Pending: Error sending transaction: " + " for id: " + str(row['_id']) + " DID:" +
+                         row['did'] + " Error: transaction reverted")
+        else:
+            error = err_message
+            update_info["$set"]["extraInfo"] = {
+                "error": error
+            }
+            num_timeout = row.get('numTimeout') or 0
+            if err_type == "TimeExhausted" and num_timeout <= 5:
+                update_info["$set"]["status"] = config.SERVICE_STATUS_PROCESSING
+                update_info["$set"]["numTimeout"] = num_timeout + 1
+            else:
                 update_info["$set"]["status"] = config.SERVICE_STATUS_REJECTED
-                col.update_one(filter_info, update_info)
-                LOG.info("Pending: Timeout while sending transaction: " +
-                         " for id: " + str(row['id']) + " DID:" + row['did'] +
-                         " Error: " + error)
-                slack_blocks[0]["text"][
-                    "text"] = f"Due to the timeout, the following transaction was rejected at {current_time}"
-                slack_blocks[2]["text"]["text"] = f"Transaction ID: {str(row['id'])}\n" \
+                if err_type == "TimeExhausted":
+                    LOG.info("Pending: Timeout while sending transaction: " +
+                             " for id: " + str(row['_id']) + " DID:" + row['did'] +
+                             " Error: " + error)
+                    slack_blocks[0]["text"][
+                        "text"] = f"Due to the timeout, the following transaction was rejected at {current_time}"
+                else:
+                    LOG.info("Pending: Error sending transaction: " +
+                             " for id: " + str(row['_id']) + " DID:" + row['did'] +
+                             " Error: " + error)
+                    slack_blocks[0]["text"][
+                        "text"] = f"The following transaction was rejected at {current_time}"
+                slack_blocks[2]["text"]["text"] = f"Transaction ID: {str(row['_id'])}\n" \
                                                   f"DID: {row['did']}\n" \
                                                   f"Error: {error}"
                 send_slack_notification(slack_blocks)
-            else:
-                update_info["$set"]["status"] = config.SERVICE_STATUS_PROCESSING
-                update_info["$set"]["numTimeout"] = row['numTimeout'] + 1
-        else:
-            update_info["$set"]["status"] = config.SERVICE_STATUS_REJECTED
-            col.update_one(filter_info, update_info)
-            LOG.info("Pending: Error sending transaction: " +
-                     " for id: " + str(row['id']) + " DID:" + row['did'] +
-                     " Error: " + error)
-            slack_blocks[0]["text"][
-                "text"] = f"The following transaction was rejected at {current_time}"
-            slack_blocks[2]["text"]["text"] = f"Transaction ID: {str(row['id'])}\n" \
-                                              f"DID: {row['did']}\n" \
-                                              f"Error: {error}"
-            send_slack_notification(slack_blocks)
-    col.update_one(filter_info, update_info)
-
-
+        updates.append(UpdateOne({"_id": row["_id"]}, update_info))
+        status_changes.append((config.SERVICE_STATUS_PROCESSING, update_info["$set"]["status"]))
+    if updates:
+        col.bulk_write(updates, ordered=False)
+        record_didtx_status_changes(status_changes)
+    # The published documents changed, so their cached resolutions and documents are stale
+    completed_dids -= {None}
+    for did in completed_dids:
+        did_resolution_cache.invalidate(did)
+    if completed_dids:
+        DidDocument._get_collection().update_many({"did": {"$in": list(completed_dids)}},
+                                                  {"$set": {"refreshed": None}})
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from mongoengine import connection, Document
+from mongoengine.base.common import _get_documents_by_db
+from pymongo import monitoring
+
+from app import log, config
+
+LOG = log.get_logger()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Counts the events of the connection pools of a MongoClient, by server
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def reset(self):
+        # Called in a forked child, where the lock may have been copied while held by another thread
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def stats(self):
+        with self._lock:
+            return {f"{host}:{port}": dict(counts) for (host, port), counts in self._servers.items()}
+
+    def _inc(self, event, name, value=1):
+        with self._lock:
+            counts = self._servers.setdefault(event.address, {
+                "open": 0, "in_use": 0, "created": 0, "closed": 0, "checkouts": 0, "checkout_failures": 0,
+                "cleared": 0
+            })
+            counts[name] += value
+
+    def pool_created(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc(event, "cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc(event, "created")
+        self._inc(event, "open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc(event, "closed")
+        self._inc(event, "open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc(event, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._inc(event, "checkouts")
+        self._inc(event, "in_use")
+
+    def connection_checked_in(self, event):
+        self._inc(event, "in_use", -1)
+
+
+class MongoConnection(object):
+    """
+    Owns the MongoClient of the process. It's the connection mongoengine uses for the models, so the code using
+    pymongo directly shares its pool instead of opening its own client. A forked child drops the client inherited
+    from its parent and connects again on first use
+    """
+
+    def __init__(self, host=None, database=None, alias=connection.DEFAULT_CONNECTION_NAME):
+        self.host = host or config.MONGO_CONNECT_HOST
+        self.database = database or config.MONGO["DATABASE"]
+        self.alias = alias
+        self.pool_metrics = PoolMetrics()
+        os.register_at_fork(after_in_child=self._forget_client)
+
+    def connect(self):
+        LOG.info("Connecting to mongodb...")
+        # The client is only created on first use
+        connection.register_connection(self.alias, self.database, host=self.host,
+                                       event_listeners=[self.pool_metrics])
+
+    @property
+    def client(self):
+        return connection.get_connection(self.alias)
+
+    @property
+    def db(self):
+        return connection.get_db(self.alias)
+
+    def get_collection(self, model):
+        return self.db[model._get_collection_name()]
+
+    def pool_stats(self):
+        return self.pool_metrics.stats()
+
+    def _forget_client(self):
+        # The sockets of the parent can be neither used nor closed from the child, so the client is dropped without
+        # calling close() and the settings are kept for the next get_connection
+        self.pool_metrics.reset()
+        connection._connections.pop(self.alias, None)
+        connection._dbs.pop(self.alias, None)
+        for doc_cls in _get_documents_by_db(self.alias, connection.DEFAULT_CONNECTION_NAME):
+            if issubclass(doc_cls, Document):
+                doc_cls._disconnect()
+
+
+mongo = MongoConnection()
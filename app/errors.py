@@ -31,6 +31,12 @@ ERR_DAILY_LIMIT_REACHED = {
     "title": "Daily limit reached",
 }
 
+ERR_RATE_LIMIT_REACHED = {
+    "status": falcon.HTTP_429,
+    "code": 66,
+    "title": "Rate limit reached",
+}
+
 ERR_NOT_FOUND = {"status": falcon.HTTP_404, "code": 10, "title": "No result found"}
 
 
@@ -45,6 +51,7 @@ class AppError(Exception):
     def __init__(self, error=ERR_UNKNOWN, description=None):
         self.error = error
         self.error["description"] = description
+        self.headers = {}
 
     @property
     def code(self):
@@ -63,14 +70,20 @@ class AppError(Exception):
         return self.error["description"]
 
     @staticmethod
-    def handle(exception, req, res, error=None):
+    def handle(req, res, exception, params):
         res.status = exception.status
         meta = OrderedDict()
         meta["code"] = exception.code
         meta["message"] = exception.title
         if exception.description:
             meta["description"] = exception.description
-        res.body = json.dumps({"meta": meta})
+        res.set_headers(exception.headers)
+        res.text = json.dumps({"meta": meta})
+
+    @staticmethod
+    async def handle_async(req, res, exception, params):
+        # Error handlers of the ASGI app have to be coroutines
+        AppError.handle(req, res, exception, params)
 
 
 class InvalidParameterError(AppError):
@@ -85,6 +98,13 @@ class DailyLimitReachedError(AppError):
         self.error["description"] = description
 
 
+class RateLimitReachedError(AppError):
+    def __init__(self, retry_after):
+        super().__init__(ERR_RATE_LIMIT_REACHED)
+        self.error["description"] = f"Too many requests, retry in {retry_after} seconds"
+        self.headers["Retry-After"] = str(retry_after)
+
+
 class NotFoundError(AppError):
     def __init__(self, method=None, url=None):
         super().__init__(ERR_NOT_FOUND)
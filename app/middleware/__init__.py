@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 
 from .auth import AuthMiddleware
+from .rate_limit import RateLimitMiddleware
@@ -25,6 +25,9 @@ class AuthMiddleware(object):
             description = 'The provided auth token is not valid'
             raise UnauthorizedError(description)
 
+    async def process_request_async(self, req, res):
+        return self.process_request(req, res)
+
     def _token_is_valid(self, token):
         if config.SECRET_KEY != token:
             return False
@@ -52,3 +55,6 @@ class AuthMiddleware(object):
                 ('Access-Control-Allow-Headers', allow_headers),
                 ('Access-Control-Max-Age', '86400'),  # 24 hours
             ))
+
+    async def process_response_async(self, req, resp, resource, req_succeeded):
+        self.process_response(req, resp, resource, req_succeeded)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from app import config
+from app.errors import RateLimitReachedError
+from app.service import RateLimiter, api_rate_limit_reached
+
+CREATE_ROUTES = ["/v1/didtx/create", "/v2/didtx/create"]
+
+
+class RateLimitMiddleware(object):
+    """
+    Rejects the calls over the limit with a 429 and a Retry-After header. The calls are counted per route and per
+    client address. The endpoints that have a DID in the path also count the calls per route and per DID from all
+    the clients
+    """
+
+    def __init__(self, rate_limiter=None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    def process_resource(self, req, res, resource, params):
+        if resource is None or req.method == "OPTIONS":
+            return
+        route = req.uri_template
+        calls = config.RATE_LIMIT_CREATE_DID if route in CREATE_ROUTES else config.RATE_LIMIT_CALLS
+        # The client is always charged so that going through many DIDs doesn't get around its limit
+        self.hit(f"{route}:{self.get_client_address(req)}", calls)
+        if params.get("did"):
+            self.hit(f"{route}:did:{params['did']}", calls)
+
+    def hit(self, key, calls):
+        retry_after = self.rate_limiter.hit(key, calls, config.RATE_LIMIT_PERIOD)
+        if retry_after is not None:
+            api_rate_limit_reached(key, calls, config.RATE_LIMIT_PERIOD, retry_after)
+            raise RateLimitReachedError(retry_after)
+
+    @staticmethod
+    def get_client_address(req, trusted_proxies=None):
+        """
+        Returns the address the trusted proxies got the call from. The entries before it in X-Forwarded-For are sent
+        by the client, which could use a new one on each call to get around the limits
+        """
+        trusted_proxies = trusted_proxies if trusted_proxies is not None else config.RATE_LIMIT_TRUSTED_PROXIES
+        if trusted_proxies <= 0:
+            return req.remote_addr
+        forwarded_for = [address.strip() for address in req.get_header("X-Forwarded-For", default="").split(",")
+                         if address.strip()]
+        if len(forwarded_for) < trusted_proxies:
+            # The call didn't go through the proxies
+            return req.remote_addr
+        return forwarded_for[-trusted_proxies]
+
+    async def process_resource_async(self, req, res, resource, params):
+        # The Mongo store is queried with pymongo, so it's done in the executor
+        await asyncio.get_running_loop().run_in_executor(None, self.process_resource, req, res, resource, params)
@@ -4,4 +4,8 @@ from .didtx import Didtx
 from .did_document import DidDocument
 from .didstate import Didstate
 from .servicecount import Servicecount
-from .walletinfo import WalletInfo
\ No newline at end of file
+from .walletinfo import WalletInfo
+from .leaderlock import LeaderLock
+from .ratelimitbucket import RateLimitBucket
+from .didresolution import DidResolution
+from .servicestats import ServiceStats
\ No newline at end of file
@@ -2,15 +2,36 @@ import datetime
 
 from mongoengine import StringField, IntField, DictField, DateTimeField, Document
 
+# Documents no one has searched for that long are removed by MongoDB
+DID_DOCUMENT_EXPIRY = datetime.timedelta(days=90)
+
 
 class DidDocument(Document):
     did = StringField(max_length=128)
     documents = DictField()
     num_searches = IntField()
     last_searched = DateTimeField()
+    # Transaction of the newest document, and last time the documents were checked against the sidechain. A null
+    # refreshed marks the documents as stale
+    last_txid = StringField()
+    refreshed = DateTimeField()
+    # Failed refreshes in a row, the DID isn't resolved again before refresh_retry_at
+    refresh_failures = IntField()
+    refresh_retry_at = DateTimeField()
+    # Moved forward on each search
+    expires_at = DateTimeField()
     created = DateTimeField()
     modified = DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            {'fields': ['did'], 'unique': True},
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ],
+        'index_background': True,
+        'auto_create_index': False
+    }
+
     def __repr__(self):
         return str(self.as_dict())
 
@@ -29,4 +50,6 @@ class DidDocument(Document):
         if not self.created:
             self.created = datetime.datetime.utcnow()
         self.modified = datetime.datetime.utcnow()
+        if self.last_searched:
+            self.expires_at = self.last_searched + DID_DOCUMENT_EXPIRY
         return super(DidDocument, self).save(*args, **kwargs)
\ No newline at end of file
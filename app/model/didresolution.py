@@ -0,0 +1,36 @@
+import datetime
+
+from mongoengine import StringField, BooleanField, DateTimeField, Document
+
+
+class DidResolution(Document):
+    did = StringField(max_length=128, primary_key=True)
+    # JSON of the resolved document, stored as a string as its keys aren't guaranteed to be valid MongoDB keys
+    document = StringField()
+    found = BooleanField()
+    # Set when a transaction of the DID completed, so every process drops its own entry
+    invalidated = DateTimeField()
+    expires_at = DateTimeField()
+    modified = DateTimeField(default=datetime.datetime.utcnow)
+
+    meta = {
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0},
+            {'fields': ['invalidated'], 'sparse': True}
+        ],
+        'index_background': True,
+        'auto_create_index': False
+    }
+
+    def __repr__(self):
+        return str(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "did": self.did,
+            "document": self.document,
+            "found": self.found,
+            "invalidated": str(self.invalidated),
+            "expires_at": str(self.expires_at),
+            "modified": str(self.modified)
+        }
@@ -1,6 +1,6 @@
 import datetime
 
-from mongoengine import IntField, StringField, DictField, DateTimeField, Document
+from mongoengine import IntField, StringField, DictField, DateTimeField, BinaryField, Document
 
 
 class Didtx(Document):
@@ -16,14 +16,35 @@ class Didtx(Document):
     version = StringField()
     numTimeout = IntField()
     walletUsed = StringField()
+    # Prepared by the API so the cron job only has to sign the transaction, not returned by the API
+    calldata = BinaryField()
+    gas = IntField()
     created = DateTimeField()
     modified = DateTimeField(default=datetime.datetime.utcnow)
 
+    # Fields that can be requested through the API. SUMMARY_FIELDS leaves out the potentially large dicts
+    FIELDS = ["id", "did", "requestFrom", "didRequestDid", "didRequest", "status", "memo", "extraInfo",
+              "blockchainTxId", "blockchainTx", "version", "numTimeout", "walletUsed", "created", "modified"]
+    SUMMARY_FIELDS = ["id", "did", "requestFrom", "didRequestDid", "status", "memo", "blockchainTxId", "version",
+                      "numTimeout", "walletUsed", "created", "modified"]
+
+    meta = {
+        'indexes': [
+            ('did', '-modified'),
+            ('did', 'status'),
+            ('did', '-id'),
+            ('status', 'version', 'created')
+        ],
+        'index_background': True,
+        # Indexes are built by app.model.indexes instead of on first access of the collection
+        'auto_create_index': False
+    }
+
     def __repr__(self):
         return str(self.as_dict())
 
-    def as_dict(self):
-        return {
+    def as_dict(self, fields=None):
+        result = {
             "id": str(self.id),
             "did": self.did,
             "requestFrom": self.requestFrom,
@@ -40,6 +61,9 @@ class Didtx(Document):
             "created": str(self.created),
             "modified": str(self.modified)
         }
+        if fields:
+            return {key: value for key, value in result.items() if key in fields}
+        return result
 
     def save(self, *args, **kwargs):
         if not self.created:
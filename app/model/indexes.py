@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Builds the indexes declared in the meta of the models and reports their sizes. The docker image runs it on every
+# start, run it on every deployment otherwise:
+#   python -m app.model.indexes
+from mongoengine.connection import get_db
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app import log
+from app.db import mongo
+from app.model import Didtx, DidDocument, Servicecount, RateLimitBucket, DidResolution
+from app.model.did_document import DID_DOCUMENT_EXPIRY
+
+LOG = log.get_logger()
+
+INDEXED_MODELS = [Didtx, Servicecount, DidDocument, RateLimitBucket, DidResolution]
+
+
+def ensure_indexes():
+    backfill_did_document_expiry()
+    report = {}
+    for model in INDEXED_MODELS:
+        collection_name = model._get_collection_name()
+        LOG.info(f"Ensuring indexes of {collection_name} in the background...")
+        ensure_model_indexes(model)
+        report[collection_name] = get_index_sizes(collection_name)
+    return report
+
+
+def ensure_model_indexes(model):
+    """
+    Same as Document.ensure_indexes, but each index is built on its own so one that fails doesn't keep the others
+    of the model from being built
+    """
+    collection = model._get_collection()
+    background = model._meta.get("index_background", False)
+    index_opts = model._meta.get("index_opts") or {}
+    for spec in model._meta["index_specs"]:
+        opts = index_opts.copy()
+        opts.update(spec)
+        fields = opts.pop("fields")
+        opts.pop("cls", None)
+        try:
+            collection.create_index(fields, background=background, **opts)
+        except OperationFailure as e:
+            # Usually a unique index that can't be built because of existing duplicates
+            LOG.info(f"Could not build the index {fields} of {collection.name}: {str(e)}")
+
+
+def backfill_did_document_expiry():
+    """
+    Sets expires_at on the documents stored before it existed, otherwise the TTL index never removes them. Needs
+    the pipeline updates of MongoDB 4.2, it's skipped on older servers
+    """
+    try:
+        version = tuple(get_db().client.server_info()["versionArray"][:2])
+        if version < (4, 2):
+            LOG.info(f"Skipping the expiry of the existing DID documents, MongoDB {version[0]}.{version[1]} doesn't "
+                     f"support pipeline updates")
+            return
+        result = DidDocument._get_collection().update_many({"expires_at": None}, [{"$set": {"expires_at": {
+            "$add": [{"$ifNull": ["$last_searched", "$$NOW"]}, int(DID_DOCUMENT_EXPIRY.total_seconds() * 1000)]
+        }}}])
+    except PyMongoError as e:
+        LOG.info(f"Could not set the expiry of the existing DID documents: {str(e)}")
+        return
+    if result.modified_count:
+        LOG.info(f"Set the expiry of {result.modified_count} DID documents")
+
+
+def get_index_sizes(collection_name):
+    try:
+        stats = get_db().command("collStats", collection_name)
+    except OperationFailure as e:
+        LOG.info(f"Could not retrieve the stats of {collection_name}: {str(e)}")
+        return {}
+    return stats.get("indexSizes", {})
+
+
+if __name__ == "__main__":
+    mongo.connect()
+    for collection_name, index_sizes in ensure_indexes().items():
+        for index_name, size in index_sizes.items():
+            LOG.info(f"{collection_name}.{index_name}: {size / 1024.0 / 1024.0:.2f} MB")
@@ -0,0 +1,23 @@
+import datetime
+
+from mongoengine import StringField, DateTimeField, Document
+
+
+class LeaderLock(Document):
+    name = StringField(max_length=64, primary_key=True)
+    owner = StringField(max_length=128)
+    expires_at = DateTimeField()
+    created = DateTimeField()
+    modified = DateTimeField(default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return str(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "expires_at": str(self.expires_at),
+            "created": str(self.created),
+            "modified": str(self.modified)
+        }
@@ -0,0 +1,30 @@
+import datetime
+
+from mongoengine import StringField, FloatField, DateTimeField, Document
+
+
+class RateLimitBucket(Document):
+    key = StringField(max_length=256, primary_key=True)
+    tokens = FloatField()
+    updated = DateTimeField(default=datetime.datetime.utcnow)
+    # Idle buckets are full again by then, so MongoDB removes them
+    expires_at = DateTimeField()
+
+    meta = {
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ],
+        'index_background': True,
+        'auto_create_index': False
+    }
+
+    def __repr__(self):
+        return str(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "key": self.key,
+            "tokens": self.tokens,
+            "updated": str(self.updated),
+            "expires_at": str(self.expires_at)
+        }
@@ -9,6 +9,14 @@ class Servicecount(Document):
     created = DateTimeField()
     modified = DateTimeField(default=datetime.datetime.utcnow)
 
+    meta = {
+        'indexes': [
+            {'fields': ['did'], 'unique': True}
+        ],
+        'index_background': True,
+        'auto_create_index': False
+    }
+
     def __repr__(self):
         return str(self.as_dict())
 
@@ -0,0 +1,32 @@
+import datetime
+
+from mongoengine import StringField, IntField, DictField, DateTimeField, Document
+
+
+class ServiceStats(Document):
+    service = StringField(max_length=64, primary_key=True)
+    users = IntField()
+    total = IntField()
+    # Transactions per application. The names are escaped as they can contain dots
+    apps = DictField()
+    # Transactions created per hour, keyed by YYYYMMDDHH, in total ("_all") and per application
+    hours = DictField()
+    # Transactions per status
+    statuses = DictField()
+    reconciled = DateTimeField()
+    modified = DateTimeField(default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return str(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "service": self.service,
+            "users": self.users,
+            "total": self.total,
+            "apps": self.apps,
+            "hours": self.hours,
+            "statuses": self.statuses,
+            "reconciled": str(self.reconciled),
+            "modified": str(self.modified)
+        }
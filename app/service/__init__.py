@@ -1,8 +1,27 @@
 # -*- coding: utf-8 -*-
 from .did_sidechain_rpc import DidSidechainRpc
+from .did_resolution_cache import DidResolutionCache, did_resolution_cache
 from .did_sidechain_rpc_v2 import DidSidechainRpcV2
 from .did_publish import DidPublish
+from .did_document_refresher import DidDocumentRefresher
 from .send_notification import *
 from .service_stats import *
 from .didtx_stats import *
+from .sidechain_connection_pool import SidechainConnectionPool, sidechain_connection_pool
+from .block_watcher import BlockWatcher, block_watcher
+from .gas_oracle import GasOracle, gas_oracle
+from .gas_estimator import GasEstimator, gas_estimator
+from .json_rpc_batch import JsonRpcBatch, JsonRpcTransportError
+from .wallet_key_manager import WalletKeyManager, wallet_key_manager
 from .web3_did_adapter import *
+from .did_request_validator import validate_did_request
+from .receipt_tracker import ReceiptTracker, receipt_tracker
+from .wallet_scheduler import WalletScheduler
+from .didtx_queue import get_didtx_queue, MemoryDidtxQueue, CappedDidtxQueue, ChangeStreamDidtxQueue
+from .service_counter import get_service_counts, increment_service_count, get_service_counts_async, \
+    increment_service_count_async, get_did_service_count, get_did_service_count_async
+from .didtx_create import *
+from .didtx_query import get_didtx_fields, get_didtx_projection, get_page_limit, get_page_query, get_page
+from .did_documents import get_did_documents, get_did_documents_async
+from .leader_lock import LeaderLock
+from .rate_limiter import RateLimiter, LocalRateLimitStore, MongoRateLimitStore
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import log, config
+
+LOG = log.get_logger()
+
+
+class AsyncMongo(object):
+    """
+    Motor client used by the ASGI app. It's created on first use so that it binds to the running event loop
+    """
+
+    def __init__(self, host=None, database=None):
+        self.host = host or config.MONGO_CONNECT_HOST
+        self.database = database or config.MONGO["DATABASE"]
+        self._client = None
+
+    @property
+    def db(self):
+        if self._client is None:
+            LOG.info("Connecting to mongodb with motor...")
+            self._client = AsyncIOMotorClient(self.host)
+        return self._client[self.database]
+
+    def get_collection(self, model):
+        return self.db[model._get_collection_name()]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+async_mongo = AsyncMongo()
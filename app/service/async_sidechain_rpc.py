@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import httpx
+
+from app import log, config
+from app.service.did_resolution_cache import did_resolution_cache
+from app.service.did_sidechain_rpc import get_documents_from_resolve_result
+
+LOG = log.get_logger()
+
+
+class AsyncDidSidechainRpc(object):
+    """
+    Non blocking calls to the DID sidechain and the cryptoname resolver used by the ASGI app. All the calls share
+    one httpx client so the connections are kept alive between requests
+    """
+
+    def __init__(self):
+        self.sidechain_rpc = config.DID_SIDECHAIN_RPC_URL_ETH
+        self.sidechain_rpc_v1 = config.DID_SIDECHAIN_RPC_URL
+        self._client = None
+        self._in_flight = {}
+
+    def get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.RPC_READ_TIMEOUT, connect=config.RPC_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=config.RPC_POOL_MAXSIZE,
+                                    max_keepalive_connections=config.RPC_POOL_CONNECTIONS)
+            )
+        return self._client
+
+    async def get_did_from_cryptoname(self, crypto_name):
+        LOG.info("Retrieving DID from cryptoname..")
+        try:
+            response = await self.get_client().get(f"https://{crypto_name}.elastos.name/did")
+            return response.text
+        except Exception as e:
+            LOG.info(f"Error while getting DID from cryptoname: {str(e)}")
+            return None
+
+    async def resolve_did(self, did):
+        """
+        Same as DidSidechainRpcV2.resolve_did. Only the in-process tier of the resolution cache is used so the
+        event loop is never blocked on MongoDB, the invalidations are checked in the executor
+        """
+        if did_resolution_cache.invalidations_due():
+            await asyncio.get_running_loop().run_in_executor(None, did_resolution_cache.check_invalidations)
+        hit, document = did_resolution_cache.get(did, shared=False)
+        if hit:
+            return document
+        lookup = self._in_flight.get(did)
+        if lookup is None:
+            lookup = self._in_flight[did] = asyncio.ensure_future(self._resolve_and_cache(did))
+            lookup.add_done_callback(lambda _: self._in_flight.pop(did, None))
+        return await asyncio.shield(lookup)
+
+    async def _resolve_and_cache(self, did):
+        try:
+            document = await self.fetch_did_document(did)
+        except Exception as e:
+            LOG.info(f"Error while resolving DID: {str(e)}")
+            return None
+        did_resolution_cache.put(did, document, shared=False)
+        return document
+
+    async def fetch_did_document(self, did):
+        LOG.info(f"Resolving DID {did} to ensure the DID document is valid...")
+        payload = {
+            "method": "did_resolveDID",
+            "params": [{
+                "did": did
+            }],
+            "id": "1"
+        }
+        response = (await self.get_client().post(self.sidechain_rpc, json=payload)).json()
+        if response.get("error"):
+            raise Exception(response["error"])
+        return response.get("result") or None
+
+    async def resolve_did_v1(self, did):
+        LOG.info("Resolving DID to ensure the DID document is valid...")
+        payload = {
+            "method": "resolvedid",
+            "params": {
+                "did": did,
+                "all": True
+            }
+        }
+        document = {}
+        try:
+            response = (await self.get_client().post(self.sidechain_rpc_v1, json=payload)).json()
+            if response and response["result"]:
+                document = response["result"]
+        except Exception as e:
+            LOG.info(f"Error while resolving DID: {e}")
+        return document
+
+    async def get_documents_specific_did(self, did):
+        return get_documents_from_resolve_result(await self.resolve_did_v1(did))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async_did_sidechain_rpc = AsyncDidSidechainRpc()
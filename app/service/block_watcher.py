@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+
+from app import log, config
+from app.service.sidechain_connection_pool import sidechain_connection_pool
+
+LOG = log.get_logger()
+
+
+class BlockWatcher(object):
+    """
+    Calls the subscribed callbacks with the block number each time a new block is added to the DID sidechain. New
+    blocks are followed with an eth_newBlockFilter, which is created again when the node forgets it, and with
+    eth_blockNumber polling when the node doesn't support filters. Callbacks run one after the other on the thread
+    of the watcher, which is started by the first subscription and by start after a fork
+    """
+
+    def __init__(self, poll_interval=None, max_silence=None):
+        self.poll_interval = poll_interval if poll_interval is not None else config.BLOCK_WATCHER_POLL_INTERVAL
+        self.max_silence = max_silence if max_silence is not None else config.BLOCK_WATCHER_MAX_SILENCE
+        self.connection_pool = sidechain_connection_pool
+        self.block_number = None
+        self._callbacks = []
+        self._filter_supported = True
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_poll = None
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+        self.start()
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.block_number = None
+                self._filter_supported = True
+                self._last_poll = None
+                thread = threading.Thread(target=self._run, name="block-watcher", daemon=True)
+                thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        filter_id = None
+        while True:
+            try:
+                w3 = self.connection_pool.get_web3()
+                if filter_id is None and self._filter_supported:
+                    filter_id = self._new_filter(w3)
+                if filter_id is None or w3.eth.get_filter_changes(filter_id):
+                    self._notify(w3.eth.block_number)
+                self._last_poll = time.monotonic()
+            except Exception as e:
+                LOG.info(f"Error while watching the blocks of the DID sidechain: {str(e)}")
+                # Usually a filter the node dropped, a new one is created on the next poll
+                filter_id = None
+            time.sleep(self.poll_interval)
+
+    def is_healthy(self):
+        """
+        Whether the watcher of this process polled the DID sidechain successfully within max_silence seconds
+        """
+        return self._pid == os.getpid() and self._last_poll is not None and \
+            time.monotonic() - self._last_poll <= self.max_silence
+
+    def _new_filter(self, w3):
+        try:
+            filter_id = w3.eth.filter("latest").filter_id
+            if not filter_id:
+                raise ValueError("No filter id returned")
+            return filter_id
+        except ValueError as e:
+            # The node answered with an error, most likely because it doesn't support filters
+            LOG.info(f"Could not create a block filter on the DID sidechain, polling the block number instead: "
+                     f"{str(e)}")
+            self._filter_supported = False
+            return None
+
+    def _notify(self, block_number):
+        if self.block_number is not None and block_number <= self.block_number:
+            return
+        self.block_number = block_number
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(block_number)
+            except Exception as e:
+                LOG.info(f"Error while handling block {block_number}: {str(e)}")
+
+
+block_watcher = BlockWatcher()
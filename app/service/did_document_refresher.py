@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from app import log, config
+from app.model import DidDocument
+from app.service.did_sidechain_rpc import get_documents_from_resolve_result
+from app.service.did_sidechain_rpc_v2 import DidSidechainRpcV2
+
+LOG = log.get_logger()
+
+
+class DidDocumentRefresher(object):
+    """
+    Keeps the cached DID documents in sync with the sidechain. The documents marked as stale, because a
+    transaction of their DID was completed, are resolved first, then the ones not checked for max_age seconds fill
+    the rest of the batch, the most searched first. The resolutions are sent as JSON-RPC batches spread over a pool
+    of threads and only the documents whose newest transaction changed are rewritten. A document that can't be
+    refreshed is retried after retry_delay seconds, doubled on each failure up to max_age. The ones no one searches
+    for anymore are removed by the TTL index of DidDocument
+    """
+
+    def __init__(self, max_age=None, batch_size=None, max_workers=None, retry_delay=None):
+        self.max_age = max_age if max_age is not None else config.DID_DOCUMENT_REFRESH_MAX_AGE
+        self.batch_size = batch_size if batch_size is not None else config.DID_DOCUMENT_REFRESH_BATCH_SIZE
+        self.max_workers = max_workers if max_workers is not None else config.DID_DOCUMENT_REFRESH_WORKERS
+        self.retry_delay = retry_delay if retry_delay is not None else config.DID_DOCUMENT_REFRESH_RETRY_DELAY
+        self.did_sidechain_rpc = DidSidechainRpcV2()
+
+    def refresh(self):
+        col = DidDocument._get_collection()
+        now = datetime.utcnow()
+        rows = self.find(col, {"refreshed": None}, now, self.batch_size)
+        if len(rows) < self.batch_size:
+            rows += self.find(col, {"refreshed": {"$lt": now - timedelta(seconds=self.max_age)}}, now,
+                              self.batch_size - len(rows))
+        if not rows:
+            return 0
+
+        results = self.resolve(list({row["did"] for row in rows}))
+        updates = []
+        changed = 0
+        for row in rows:
+            result = results.get(row["did"])
+            if isinstance(result, Exception):
+                # Keep the current documents and retry later
+                updates.append(self.retry_update(row, now))
+                continue
+            transactions = (result or {}).get("transaction") or []
+            last_txid = transactions[0].get("txid") if transactions else None
+            update = {"refreshed": now}
+            if "last_txid" not in row or last_txid != row["last_txid"]:
+                try:
+                    documents = get_documents_from_resolve_result(result)
+                except Exception as e:
+                    LOG.info(f"Error while reading the documents of DID {row['did']}: {str(e)}")
+                    updates.append(self.retry_update(row, now))
+                    continue
+                update.update({"documents": documents, "last_txid": last_txid, "modified": now})
+                changed += 1
+            updates.append(UpdateOne({"_id": row["_id"]}, {"$set": update,
+                                                           "$unset": {"refresh_failures": "", "refresh_retry_at": ""}}))
+        if updates:
+            col.bulk_write(updates, ordered=False)
+        LOG.info(f"Checked {len(rows)} DID documents, {changed} of them changed")
+        return changed
+
+    def find(self, col, query, now, limit):
+        query = dict(query, **{"$or": [{"refresh_retry_at": None}, {"refresh_retry_at": {"$lte": now}}]})
+        return list(col.find(query, {"did": 1, "last_txid": 1, "refresh_failures": 1})
+                    .sort([("num_searches", -1), ("last_searched", -1)]).limit(limit))
+
+    def retry_update(self, row, now):
+        failures = (row.get("refresh_failures") or 0) + 1
+        delay = min(self.retry_delay * 2 ** min(failures - 1, 16), self.max_age)
+        return UpdateOne({"_id": row["_id"]}, {"$set": {
+            "refresh_failures": failures,
+            "refresh_retry_at": now + timedelta(seconds=delay)
+        }})
+
+    def resolve(self, dids):
+        size = config.RPC_MAX_BATCH_SIZE
+        chunks = [dids[start:start + size] for start in range(0, len(dids), size)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for documents in executor.map(self.did_sidechain_rpc.resolve_dids, chunks):
+                results.update(documents)
+        return results
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Cached DID documents served by /v1/documents, shared by the WSGI and ASGI resources
+import datetime
+
+from pymongo import ReturnDocument
+
+from app.model import DidDocument
+from app.model.did_document import DID_DOCUMENT_EXPIRY
+
+
+def get_did_documents(did, get_documents):
+    """
+    Returns the cached documents of the DID and counts the search. They're fetched with get_documents and cached
+    when the DID wasn't searched before
+    """
+    collection = DidDocument._get_collection()
+    row = collection.find_one_and_update(*_search_update(did), return_document=ReturnDocument.AFTER)
+    if row:
+        return DidDocument._from_son(row).as_dict()
+    documents = get_documents(did)
+    if not documents:
+        return {}
+    row = collection.find_one_and_update(*_store_update(did, documents), upsert=True,
+                                         return_document=ReturnDocument.AFTER)
+    return DidDocument._from_son(row).as_dict()
+
+
+async def get_did_documents_async(collection, did, get_documents):
+    """
+    Same as get_did_documents using the motor collection of DidDocument and a coroutine get_documents
+    """
+    row = await collection.find_one_and_update(*_search_update(did), return_document=ReturnDocument.AFTER)
+    if row:
+        return DidDocument._from_son(row).as_dict()
+    documents = await get_documents(did)
+    if not documents:
+        return {}
+    row = await collection.find_one_and_update(*_store_update(did, documents), upsert=True,
+                                               return_document=ReturnDocument.AFTER)
+    return DidDocument._from_son(row).as_dict()
+
+
+def _search_update(did):
+    now = datetime.datetime.utcnow()
+    return {"did": did}, {
+        "$inc": {"num_searches": 1},
+        "$set": {"last_searched": now, "expires_at": now + DID_DOCUMENT_EXPIRY, "modified": now}
+    }
+
+
+def _store_update(did, documents):
+    # Upserted in case a concurrent request stored the documents of the same DID in the meantime
+    now = datetime.datetime.utcnow()
+    return {"did": did}, {
+        "$set": {"documents": documents, "last_searched": now, "expires_at": now + DID_DOCUMENT_EXPIRY,
+                 "modified": now},
+        "$inc": {"num_searches": 1},
+        "$setOnInsert": {"created": now}
+    }
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import json
+
+from app import log
+
+LOG = log.get_logger()
+
+DID_PREFIX = "did:elastos:"
+DID_SPECIFICATION_PREFIX = "elastos/did/"
+DID_OPERATIONS = ["create", "update", "transfer", "deactivate"]
+DID_PROOF_FIELDS = ["type", "verificationMethod", "signature"]
+
+
+def decode_did_request_payload(payload):
+    payload = payload + "=" * divmod(len(payload), 4)[1]
+    return base64.urlsafe_b64decode(payload).decode("utf-8")
+
+
+def validate_did_request(did_request):
+    """
+    Checks the structure of a didRequest without touching the network. Returns the decoded payload along with an
+    error message if the request is invalid. Web3DidAdapter.prepare_transaction then checks it can be ABI encoded
+    into a publishDidTransaction call.
+    """
+    if not isinstance(did_request, dict):
+        return None, "didRequest must be an object"
+
+    header = did_request.get("header")
+    if not isinstance(header, dict):
+        return None, "didRequest header is missing"
+    if not str(header.get("specification", "")).startswith(DID_SPECIFICATION_PREFIX):
+        return None, f"Unsupported didRequest specification: {header.get('specification')}"
+    operation = header.get("operation")
+    if operation not in DID_OPERATIONS:
+        return None, f"Unsupported didRequest operation: {operation}"
+
+    proof = did_request.get("proof")
+    if not isinstance(proof, dict):
+        return None, "didRequest proof is missing"
+    for field in DID_PROOF_FIELDS:
+        if not isinstance(proof.get(field), str) or not proof[field]:
+            return None, f"didRequest proof is missing the field '{field}'"
+
+    payload = did_request.get("payload")
+    if not isinstance(payload, str) or not payload:
+        return None, "didRequest payload is missing"
+    try:
+        decoded_payload = decode_did_request_payload(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        return None, f"didRequest payload is not valid base64url: {str(e)}"
+
+    if operation == "deactivate" and decoded_payload.startswith(DID_PREFIX):
+        # Deactivate requests carry the DID itself as the payload instead of a DID document
+        payload_json = {"id": decoded_payload}
+    else:
+        try:
+            payload_json = json.loads(decoded_payload)
+        except ValueError as e:
+            return None, f"didRequest payload is not a valid DID document: {str(e)}"
+        if not isinstance(payload_json, dict):
+            return None, "didRequest payload is not a valid DID document"
+    if not str(payload_json.get("id", "")).startswith(DID_PREFIX):
+        return None, f"didRequest payload has an invalid id: {payload_json.get('id')}"
+
+    return payload_json, None
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from app import log, config
+from app.model import DidResolution
+
+LOG = log.get_logger()
+
+
+class DidResolutionCache(object):
+    """
+    Caches the documents returned by did_resolveDID, and the DIDs that don't exist for a shorter time. Entries are
+    kept in an LRU in the memory of the process and, when `shared` is set, in the DidResolution collection so that
+    all the processes benefit from each other's lookups. Concurrent lookups of the same DID are done only once.
+
+    Errors while resolving are never cached. Entries are invalidated when a transaction of the DID is completed,
+    which usually happens in the worker process. The invalidation is recorded in the DidResolution collection, and
+    every process drops the DIDs invalidated there at most every invalidation_interval seconds, whether it shares
+    its entries or not
+    """
+
+    def __init__(self, ttl=None, negative_ttl=None, max_size=None, shared=None, invalidation_interval=None):
+        self.ttl = ttl if ttl is not None else config.DID_RESOLUTION_CACHE_TTL
+        self.negative_ttl = negative_ttl if negative_ttl is not None else config.DID_RESOLUTION_CACHE_NEGATIVE_TTL
+        self.max_size = max_size if max_size is not None else config.DID_RESOLUTION_CACHE_SIZE
+        self.shared = shared if shared is not None else config.DID_RESOLUTION_CACHE_SHARED
+        self.invalidation_interval = invalidation_interval if invalidation_interval is not None \
+            else config.DID_RESOLUTION_CACHE_INVALIDATION_INTERVAL
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._invalidations_lock = threading.Lock()
+        self._invalidations_checked = time.monotonic()
+        # MongoDB keeps milliseconds, the margin makes sure an invalidation recorded right now is seen
+        self._last_invalidation = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+
+    def resolve(self, did, resolver):
+        """
+        Returns the cached document of the DID, or None if it doesn't exist. On a miss, resolver(did) is called and
+        has to return the document or None if the DID doesn't exist, and raise if it couldn't be resolved
+        """
+        hit, document = self.get(did)
+        if hit:
+            return document
+
+        with self._lock:
+            lookup = self._in_flight.get(did)
+            leader = lookup is None
+            if leader:
+                lookup = self._in_flight[did] = _Lookup()
+        if not leader:
+            lookup.done.wait()
+            return lookup.document
+
+        try:
+            lookup.document = resolver(did)
+            self.put(did, lookup.document)
+        except Exception as e:
+            LOG.info(f"Error while resolving DID {did}: {str(e)}")
+        finally:
+            with self._lock:
+                del self._in_flight[did]
+            lookup.done.set()
+        return lookup.document
+
+    def get(self, did, shared=True):
+        """
+        Returns (hit, document). Set shared to False to only look in the memory of the process, invalidations are
+        then only dropped by check_invalidations
+        """
+        if shared:
+            self.check_invalidations()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(did)
+            if entry:
+                if entry[0] > now:
+                    self._entries.move_to_end(did)
+                    return True, entry[1]
+                del self._entries[did]
+        if not (shared and self.shared):
+            return False, None
+
+        try:
+            row = DidResolution._get_collection().find_one(
+                {"_id": did, "found": {"$ne": None}, "expires_at": {"$gt": datetime.datetime.utcnow()}}
+            )
+        except Exception as e:
+            LOG.info(f"Error while retrieving the cached resolution of DID {did}: {str(e)}")
+            return False, None
+        if not row:
+            return False, None
+        document = json.loads(row["document"]) if row.get("found") else None
+        remaining = (row["expires_at"] - datetime.datetime.utcnow()).total_seconds()
+        self._put_local(did, document, remaining)
+        return True, document
+
+    def put(self, did, document, shared=True):
+        ttl = self.ttl if document else self.negative_ttl
+        self._put_local(did, document, ttl)
+        if not (shared and self.shared):
+            return
+        now = datetime.datetime.utcnow()
+        try:
+            DidResolution._get_collection().update_one({"_id": did}, {"$set": {
+                "document": json.dumps(document) if document else None,
+                "found": bool(document),
+                "expires_at": now + datetime.timedelta(seconds=ttl),
+                "modified": now
+            }}, upsert=True)
+        except Exception as e:
+            LOG.info(f"Error while caching the resolution of DID {did}: {str(e)}")
+
+    def invalidate(self, did):
+        with self._lock:
+            self._entries.pop(did, None)
+        # Kept until the entries cached before it have expired everywhere
+        now = datetime.datetime.utcnow()
+        try:
+            DidResolution._get_collection().update_one({"_id": did}, {"$set": {
+                "document": None,
+                "found": None,
+                "invalidated": now,
+                "expires_at": now + datetime.timedelta(seconds=max(self.ttl, self.negative_ttl)),
+                "modified": now
+            }}, upsert=True)
+        except Exception as e:
+            LOG.info(f"Error while invalidating the cached resolution of DID {did}: {str(e)}")
+
+    def invalidations_due(self):
+        return time.monotonic() - self._invalidations_checked >= self.invalidation_interval
+
+    def check_invalidations(self):
+        """
+        Drops the entries of the DIDs invalidated by any process since the last check. Does nothing until
+        invalidation_interval seconds have passed since then, or while another thread is checking
+        """
+        if not self.invalidations_due() or not self._invalidations_lock.acquire(blocking=False):
+            return
+        try:
+            self._invalidations_checked = time.monotonic()
+            rows = list(DidResolution._get_collection().find(
+                {"invalidated": {"$gt": self._last_invalidation}}, {"invalidated": 1}
+            ))
+            with self._lock:
+                for row in rows:
+                    self._entries.pop(row["_id"], None)
+            if rows:
+                self._last_invalidation = max(row["invalidated"] for row in rows)
+        except Exception as e:
+            LOG.info(f"Error while checking the invalidated DID resolutions: {str(e)}")
+        finally:
+            self._invalidations_lock.release()
+
+    def _put_local(self, did, document, ttl):
+        with self._lock:
+            self._entries[did] = (time.monotonic() + ttl, document)
+            self._entries.move_to_end(did)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class _Lookup(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.document = None
+
+
+did_resolution_cache = DidResolutionCache()
@@ -99,38 +99,7 @@ class DidSidechainRpc(object):
             return None
 
     def get_documents_specific_did(self, did):
-        documents = {}
-        result = self.resolve_did(did)
-        if result:
-            transactions = result.get("transaction", None)
-            if not transactions:
-                return documents
-            # Only deal with the last 5 DID documents
-            for tx in transactions[:5]:
-                # Need to add some extra padding so TypeError is not thrown sometimes
-                payload = base64.b64decode(tx["operation"]["payload"] + "===").decode("utf-8")
-                payload_json = json.loads(payload)
-
-                verifiable_creds = []
-                if "verifiableCredential" in payload_json.keys():
-                    creds = payload_json["verifiableCredential"]
-                    for cred in creds:
-                        verifiable_cred = {
-                            "id": cred["id"],
-                            "issuance_date": cred["issuanceDate"],
-                            "subject": cred["credentialSubject"],
-                            "expiration_date": cred["expirationDate"],
-                            "type": cred["type"]
-                        }
-                        if "issuer" in cred.keys():
-                            verifiable_cred["issuer"] = cred["issuer"]
-                        verifiable_creds.append(verifiable_cred)
-
-                documents[tx["txid"]] = {
-                    "published": tx["timestamp"],
-                    "verifiable_creds": verifiable_creds
-                }
-        return documents
+        return get_documents_from_resolve_result(self.resolve_did(did))
 
     def get_utxos(self, addresses):
         payload = {
@@ -150,4 +119,38 @@ class DidSidechainRpc(object):
                 "vout"]
         except Exception as e:
             LOG.info(f"Error while getting UTXOs from the DID sidechain: {e}")
-            return None, None, None, None
\ No newline at end of file
+            return None, None, None, None
+
+
+def get_documents_from_resolve_result(result):
+    documents = {}
+    if result:
+        transactions = result.get("transaction", None)
+        if not transactions:
+            return documents
+        # Only deal with the last 5 DID documents
+        for tx in transactions[:5]:
+            # Need to add some extra padding so TypeError is not thrown sometimes
+            payload = base64.b64decode(tx["operation"]["payload"] + "===").decode("utf-8")
+            payload_json = json.loads(payload)
+
+            verifiable_creds = []
+            if "verifiableCredential" in payload_json.keys():
+                creds = payload_json["verifiableCredential"]
+                for cred in creds:
+                    verifiable_cred = {
+                        "id": cred["id"],
+                        "issuance_date": cred["issuanceDate"],
+                        "subject": cred["credentialSubject"],
+                        "expiration_date": cred["expirationDate"],
+                        "type": cred["type"]
+                    }
+                    if "issuer" in cred.keys():
+                        verifiable_cred["issuer"] = cred["issuer"]
+                    verifiable_creds.append(verifiable_cred)
+
+            documents[tx["txid"]] = {
+                "published": tx["timestamp"],
+                "verifiable_creds": verifiable_creds
+            }
+    return documents
@@ -2,11 +2,14 @@
 
 from web3.main import Web3
 from web3.exceptions import TimeExhausted
-import base64
+from web3._utils.method_formatters import receipt_formatter
 import json
-import requests
 
 from app import log, config
+from app.service.sidechain_connection_pool import sidechain_connection_pool
+from app.service.json_rpc_batch import JsonRpcBatch, JsonRpcTransportError
+from app.service.did_resolution_cache import did_resolution_cache
+from app.service.did_sidechain_rpc import get_documents_from_resolve_result
 
 LOG = log.get_logger()
 
@@ -15,13 +18,15 @@ class DidSidechainRpcV2(object):
     def __init__(self):
         self.sidechain_rpc = config.DID_SIDECHAIN_RPC_URL_ETH
         self.contract_address = config.DID_CONTRACT_ADDRESS
+        self.connection_pool = sidechain_connection_pool
 
     def get_did_from_cryptoname(self, crypto_name):
         LOG.info("Retrieving DID from cryptoname..")
         try:
 
             crypto_name_url = f"https://{crypto_name}.elastos.name/did"
-            response = requests.get(crypto_name_url, timeout=config.REQUEST_TIMEOUT).text
+            session = self.connection_pool.get_session()
+            response = session.get(crypto_name_url, timeout=config.REQUEST_TIMEOUT).text
             return response
         except Exception as e:
             LOG.info(f"Error while getting DID from cryptoname: {str(e)}")
@@ -30,7 +35,7 @@ class DidSidechainRpcV2(object):
     def get_block_count(self) -> int:
         LOG.info("Get block count...")
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+            w3 = self.connection_pool.get_web3()
             currentBlock = w3.eth.get_block_number()
             LOG.info("Actual block number: " + str(currentBlock))
             return currentBlock
@@ -42,14 +47,92 @@ class DidSidechainRpcV2(object):
         LOG.info(f"Retrieving current balance on DID sidechain for address {address}")
         balance = 0
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+            w3 = self.connection_pool.get_web3()
             balance = float(w3.eth.get_balance(Web3.toChecksumAddress(address)))
             balance = balance / 1000000000000000000.0
         except Exception as e:
             LOG.info(f"Error while retrieving balance for an address: {e}")
         return balance
 
+    def get_balances(self, addresses):
+        LOG.info(f"Retrieving current balance on DID sidechain for {len(addresses)} addresses")
+        batch = JsonRpcBatch()
+        calls = {address: batch.add("eth_getBalance", [Web3.toChecksumAddress(address), "latest"])
+                 for address in addresses}
+        batch.execute()
+        balances = {}
+        for address, call in calls.items():
+            balance = 0
+            if call.error:
+                LOG.info(f"Error while retrieving balance for an address: {call.error}")
+            elif call.result:
+                balance = int(call.result, 16) / 1000000000000000000.0
+            balances[address] = balance
+        return balances
+
+    def get_transaction_counts(self, addresses, block_identifier="latest"):
+        batch = JsonRpcBatch()
+        calls = {address: batch.add("eth_getTransactionCount", [Web3.toChecksumAddress(address), block_identifier])
+                 for address in addresses}
+        batch.execute()
+        counts = {}
+        for address, call in calls.items():
+            if call.error or call.result is None:
+                LOG.info(f"Error while getting the transaction count for {address}: {call.error}")
+                counts[address] = None
+            else:
+                counts[address] = int(call.result, 16)
+        return counts
+
+    def get_transaction_receipts(self, txids):
+        """
+        Returns a dict keyed by txid. The value is the receipt, None if the transaction is not in a block yet, a
+        JsonRpcTransportError if the node couldn't be reached or an Exception if the node failed to get the receipt
+        """
+        batch = JsonRpcBatch()
+        calls = {txid: batch.add("eth_getTransactionReceipt", [txid]) for txid in txids}
+        batch.execute()
+        receipts = {}
+        for txid, call in calls.items():
+            if call.transport_error:
+                receipts[txid] = JsonRpcTransportError(call.error)
+            elif call.error:
+                receipts[txid] = Exception(call.error)
+            elif call.result:
+                receipts[txid] = receipt_formatter(call.result)
+            else:
+                receipts[txid] = None
+        return receipts
+
+    def resolve_dids(self, dids):
+        """
+        Returns a dict keyed by DID. The value is the result of did_resolveDID, None if the DID doesn't exist or an
+        Exception if it couldn't be resolved
+        """
+        LOG.info(f"Resolving {len(dids)} DIDs...")
+        batch = JsonRpcBatch()
+        calls = {did: batch.add("did_resolveDID", [{"did": did}]) for did in dids}
+        batch.execute()
+        documents = {}
+        for did, call in calls.items():
+            if call.error:
+                LOG.info(f"Error while resolving DID {did}: {call.error}")
+                documents[did] = Exception(call.error)
+            else:
+                documents[did] = call.result or None
+        return documents
+
     def resolve_did(self, did):
+        """
+        Returns the document of the DID, or None if it doesn't exist or couldn't be resolved. Goes through the
+        resolution cache
+        """
+        return did_resolution_cache.resolve(did, self.fetch_did_document)
+
+    def fetch_did_document(self, did):
+        """
+        Resolves the DID on the sidechain. Returns None if the DID doesn't exist and raises if it couldn't be resolved
+        """
         LOG.info(f"Resolving DID {did} to ensure the DID document is valid...")
         payload = {
             "method": "did_resolveDID",
@@ -58,20 +141,17 @@ class DidSidechainRpcV2(object):
             }],
             "id": "1"
         }
-        try:
-            response = requests.post(self.sidechain_rpc, json=payload, timeout=config.REQUEST_TIMEOUT).json()
-            LOG.info(response)
-            if response and response["result"]:
-                document = response["result"]
-        except Exception as e:
-            LOG.info(f"Error while resolving DID: {str(e)}")
-        return document
+        session = self.connection_pool.get_session()
+        response = session.post(self.sidechain_rpc, json=payload, timeout=config.REQUEST_TIMEOUT).json()
+        if response.get("error"):
+            raise Exception(response["error"])
+        return response.get("result") or None
 
     def wait_for_transaction_receipt(self, txid):
         LOG.info("Waiting for transaction receipt from the DID sidechain...")
 
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+            w3 = self.connection_pool.get_web3()
             tx_receipt = w3.eth.wait_for_transaction_receipt(txid, timeout=30, poll_latency=0.1)
             return {
                 "tx_receipt": json.loads(Web3.toJSON(tx_receipt)),
@@ -97,7 +177,7 @@ class DidSidechainRpcV2(object):
         LOG.info(f"Retrieving transaction {txid} from the DID sidechain...")
 
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+            w3 = self.connection_pool.get_web3()
             tx = w3.eth.get_transaction_receipt(txid)
             return json.loads(Web3.toJSON(tx))
         except Exception as e:
@@ -108,7 +188,7 @@ class DidSidechainRpcV2(object):
         LOG.info("Sending transaction to the DID sidechain...")
 
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+            w3 = self.connection_pool.get_web3()
             tx = w3.eth.send_raw_transaction(signed_transaction.rawTransaction)
             return {
                 "tx_id": tx.hex(),
@@ -122,35 +202,4 @@ class DidSidechainRpcV2(object):
             }
 
     def get_documents_specific_did(self, did):
-        documents = {}
-        result = self.resolve_did(did)
-        if result:
-            transactions = result.get("transaction", None)
-            if not transactions:
-                return documents
-            # Only deal with the last 5 DID documents
-            for tx in transactions[:5]:
-                # Need to add some extra padding so TypeError is not thrown sometimes
-                payload = base64.b64decode(tx["operation"]["payload"] + "===").decode("utf-8")
-                payload_json = json.loads(payload)
-
-                verifiable_creds = []
-                if "verifiableCredential" in payload_json.keys():
-                    creds = payload_json["verifiableCredential"]
-                    for cred in creds:
-                        verifiable_cred = {
-                            "id": cred["id"],
-                            "issuance_date": cred["issuanceDate"],
-                            "subject": cred["credentialSubject"],
-                            "expiration_date": cred["expirationDate"],
-                            "type": cred["type"]
-                        }
-                        if "issuer" in cred.keys():
-                            verifiable_cred["issuer"] = cred["issuer"]
-                        verifiable_creds.append(verifiable_cred)
-
-                documents[tx["txid"]] = {
-                    "published": tx["timestamp"],
-                    "verifiable_creds": verifiable_creds
-                }
-        return documents
+        return get_documents_from_resolve_result(self.resolve_did(did))
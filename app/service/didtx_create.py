@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# Logic of the /v1/didtx/create and /v2/didtx/create endpoints shared by the WSGI and ASGI resources. The resources
+# only do the I/O; the functions that need MongoDB come in pairs, the async one taking the motor collection
+import base64
+import datetime
+import json
+
+from pymongo import ReturnDocument
+
+from app import log, config
+from app.errors import InvalidParameterError, UserNotExistsError, DailyLimitReachedError
+from app.model import Didtx
+from app.service.did_publish import DidPublish
+from app.service.did_request_validator import validate_did_request
+from app.service.service_counter import increment_service_count, increment_service_count_async
+from app.service.service_stats import record_didtx_created, record_didtx_created_async, is_new_user, \
+    is_new_user_async
+from app.service.web3_did_adapter import Web3DidAdapter
+
+LOG = log.get_logger()
+
+
+def get_did(did):
+    return did.replace("did:elastos:", "").split("#")[0]
+
+
+def get_did_request_did_v1(did_request):
+    payload = did_request["payload"]
+    payload = payload + "=" * divmod(len(payload), 4)[1]
+    return get_did(json.loads(base64.urlsafe_b64decode(payload))["id"])
+
+
+def check_did_request_v1(did_request_did, did_request):
+    """
+    Builds the raw transaction of the didRequest to make sure it's valid. Calls the DID sidechain
+    """
+    if not DidPublish().create_raw_transaction(did_request_did, did_request):
+        err_message = "Could not generate a valid transaction out of the given didRequest"
+        LOG.info(f"Error /v1/didtx/create: {err_message}")
+        raise InvalidParameterError(description=err_message)
+
+
+def prepare_did_request_v2(did_request):
+    """
+    Validates the didRequest and returns its DID along with the calldata and gas limit of its transaction. Calls the
+    DID sidechain unless DID_REQUEST_OFFLINE_VALIDATION is set
+    """
+    did_request_payload, err_message = validate_did_request(did_request)
+    calldata, gas = None, None
+    if not err_message:
+        did_publish = Web3DidAdapter()
+        if config.DID_REQUEST_OFFLINE_VALIDATION:
+            calldata, gas, err_message = did_publish.prepare_transaction(did_request, estimate_gas=False)
+        else:
+            calldata, gas, err_message = did_publish.prepare_transaction(did_request, config.WALLETSV2[0])
+    if err_message:
+        err_message = f"Could not generate a valid transaction out of the given didRequest. " \
+                      f"Error Message: {err_message}"
+        LOG.info(f"Error /v2/didtx/create: {err_message}")
+        raise InvalidParameterError(description=err_message)
+    return get_did(did_request_payload["id"]), calldata, gas
+
+
+def get_caller_did(data, did_request_did, resolve_did, version):
+    """
+    Returns the DID making the call if it resolves on the DID sidechain, the DID of the didRequest otherwise
+    """
+    try:
+        caller_did = get_did(data["did"])
+        # Verify whether the DID who's making the call, is valid
+        if not resolve_did(caller_did):
+            err_message = f"Invalid DID: {caller_did}"
+            LOG.info(f"Error /{version}/didtx/create: {err_message}")
+            raise UserNotExistsError(description=err_message)
+    except:
+        LOG.info(f"Info /{version}/didtx/create: Defaulting to DID found inside didRequest payload")
+        caller_did = did_request_did
+    return caller_did
+
+
+async def get_caller_did_async(data, did_request_did, resolve_did, version):
+    """
+    Same as get_caller_did with a coroutine resolve_did
+    """
+    try:
+        caller_did = get_did(data["did"])
+        if not await resolve_did(caller_did):
+            err_message = f"Invalid DID: {caller_did}"
+            LOG.info(f"Error /{version}/didtx/create: {err_message}")
+            raise UserNotExistsError(description=err_message)
+    except:
+        LOG.info(f"Info /{version}/didtx/create: Defaulting to DID found inside didRequest payload")
+        caller_did = did_request_did
+    return caller_did
+
+
+def transaction_already_sent_v1(did, did_request, memo):
+    """
+    Returns the id of the Processing row of the DID, otherwise the one of its Pending row after replacing its
+    didRequest and memo, or None
+    """
+    collection = Didtx._get_collection()
+    row = collection.find_one(*_processing_query(did))
+    if not row:
+        row = collection.find_one_and_update(*_pending_v1_update(did, did_request, memo), projection={"_id": 1},
+                                             return_document=ReturnDocument.AFTER)
+    return str(row["_id"]) if row else None
+
+
+async def transaction_already_sent_v1_async(collection, did, did_request, memo):
+    """
+    Same as transaction_already_sent_v1 using the motor collection of Didtx
+    """
+    row = await collection.find_one(*_processing_query(did))
+    if not row:
+        row = await collection.find_one_and_update(*_pending_v1_update(did, did_request, memo),
+                                                   projection={"_id": 1}, return_document=ReturnDocument.AFTER)
+    return str(row["_id"]) if row else None
+
+
+def transaction_already_sent_v2(did, did_request, memo, calldata, gas):
+    """
+    Returns the id of the Pending row of the DID after replacing its didRequest and memo, otherwise the one of its
+    Processing row, or None
+    """
+    collection = Didtx._get_collection()
+    # The Pending row is updated in the same operation that finds it, so the cron can't pick it up in between
+    row = collection.find_one_and_update(*_pending_v2_update(did, did_request, memo, calldata, gas),
+                                         projection={"_id": 1}, return_document=ReturnDocument.AFTER)
+    if not row:
+        row = collection.find_one(*_processing_query(did))
+    return str(row["_id"]) if row else None
+
+
+async def transaction_already_sent_v2_async(collection, did, did_request, memo, calldata, gas):
+    """
+    Same as transaction_already_sent_v2 using the motor collection of Didtx
+    """
+    row = await collection.find_one_and_update(*_pending_v2_update(did, did_request, memo, calldata, gas),
+                                               projection={"_id": 1}, return_document=ReturnDocument.AFTER)
+    if not row:
+        row = await collection.find_one(*_processing_query(did))
+    return str(row["_id"]) if row else None
+
+
+def duplicate_result(counts, confirmation_id):
+    return {
+        "duplicate": True,
+        "service_count": max(counts.values()),
+        "confirmation_id": confirmation_id
+    }
+
+
+def check_daily_limit(counts, version):
+    """
+    Raises if the caller or the DID of the didRequest used the "did_publish" service too many times today
+    """
+    if max(counts.values()) >= config.SERVICE_DIDPUBLISH_DAILY_LIMIT:
+        LOG.info(f"Error /{version}/didtx/create: Daily limit reached for this DID")
+        raise DailyLimitReachedError()
+
+
+def created_result(counts, caller_did, confirmation_id):
+    return {
+        "service_count": counts[caller_did],
+        "duplicate": False,
+        "confirmation_id": confirmation_id
+    }
+
+
+def new_didtx(data, caller_did, did_request_did, version, calldata=None, gas=None):
+    """
+    Returns the validated row of a new transaction, ready to be inserted
+    """
+    now = datetime.datetime.utcnow()
+    row = Didtx(
+        did=caller_did,
+        requestFrom=data["requestFrom"],
+        didRequestDid=did_request_did,
+        didRequest=data["didRequest"],
+        calldata=calldata,
+        gas=gas,
+        memo=data["memo"],
+        version=version,
+        status=config.SERVICE_STATUS_PENDING,
+        created=now,
+        modified=now
+    )
+    row.validate()
+    return row
+
+
+def count_didtx_created(didtx_id, caller_did, did_request_did, request_from):
+    """
+    Counts the new transaction in the "did_publish" service counts of both DIDs and in the service statistics
+    """
+    increment_service_count(caller_did, config.SERVICE_DIDPUBLISH)
+    increment_service_count(did_request_did, config.SERVICE_DIDPUBLISH)
+    record_didtx_created(request_from, is_new_user(caller_did, didtx_id))
+
+
+async def count_didtx_created_async(didtx_collection, servicecount_collection, stats_collection, didtx_id,
+                                    caller_did, did_request_did, request_from):
+    """
+    Same as count_didtx_created using the motor collections of Didtx, Servicecount and ServiceStats
+    """
+    await increment_service_count_async(servicecount_collection, caller_did, config.SERVICE_DIDPUBLISH)
+    await increment_service_count_async(servicecount_collection, did_request_did, config.SERVICE_DIDPUBLISH)
+    await record_didtx_created_async(stats_collection, request_from,
+                                     await is_new_user_async(didtx_collection, caller_did, didtx_id))
+
+
+def _pending_v1_update(did, did_request, memo):
+    return {"did": did, "status": config.SERVICE_STATUS_PENDING}, \
+           {"$set": {"memo": memo, "didRequest": did_request, "modified": datetime.datetime.utcnow()}}
+
+
+def _pending_v2_update(did, did_request, memo, calldata, gas):
+    return {"did": did, "status": config.SERVICE_STATUS_PENDING}, \
+           {"$set": {"memo": memo, "didRequest": did_request, "calldata": calldata, "gas": gas,
+                     "modified": datetime.datetime.utcnow()}}
+
+
+def _processing_query(did):
+    # If another transaction for this DID is already Processing, it's returned as is because we don't want to create
+    # a new request without that first being processed successfully
+    return {"did": did, "status": config.SERVICE_STATUS_PROCESSING}, {"_id": 1}
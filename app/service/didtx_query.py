@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Query parameters and paging of /v2/didtx/did/{did}, shared by the WSGI and ASGI resources
+from bson import ObjectId
+
+from app import config
+from app.errors import InvalidParameterError
+from app.model import Didtx
+
+
+def get_didtx_fields(summary, fields):
+    """
+    Returns the fields to return for each row, or None for all of them
+    """
+    if (summary or "false").lower() in ["true", "1"]:
+        return Didtx.SUMMARY_FIELDS
+    fields = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    if not fields:
+        return None
+    invalid_fields = [field for field in fields if field not in Didtx.FIELDS]
+    if invalid_fields:
+        raise InvalidParameterError(description=f"Invalid fields: {', '.join(invalid_fields)}")
+    # The id is always returned as it's the cursor used to page through the rows
+    return ["id"] + [field for field in fields if field != "id"]
+
+
+def get_didtx_projection(fields):
+    return {("_id" if field == "id" else field): 1 for field in fields} if fields else None
+
+
+def get_page_limit(limit):
+    if limit is None:
+        return config.DIDTX_PAGE_DEFAULT_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidParameterError(description=f"Invalid limit: {limit}")
+    if limit < 1 or limit > config.DIDTX_PAGE_MAX_LIMIT:
+        raise InvalidParameterError(description=f"The limit must be between 1 and {config.DIDTX_PAGE_MAX_LIMIT}")
+    return limit
+
+
+def get_page_query(did, after):
+    """
+    Rows are paged on their id, which unlike modified never changes and is unique
+    """
+    query = {"did": did}
+    if after is not None:
+        if not ObjectId.is_valid(after):
+            raise InvalidParameterError(description=f"Invalid cursor: {after}")
+        query["_id"] = {"$lt": ObjectId(after)}
+    return query
+
+
+def get_page(rows, limit, fields, total):
+    """
+    rows are the raw rows of the page sorted by descending id, with one more row than limit if there's a next page
+    """
+    return {
+        "items": [Didtx._from_son(row).as_dict(fields) for row in rows[:limit]],
+        "next": str(rows[limit - 1]["_id"]) if len(rows) > limit else None,
+        "total": total
+    }
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import datetime
+import queue
+import threading
+import time
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app import log, config
+from app.model import Didtx
+
+LOG = log.get_logger()
+
+
+class MemoryDidtxQueue(object):
+    """
+    Only reaches a consumer running in the same process as the API. Nothing is queued until one is registered, as
+    no one would ever take the ids out; the cron job sends those transactions
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._consuming = False
+
+    def put(self, confirmation_id):
+        if not self._consuming:
+            return
+        self._queue.put(confirmation_id)
+
+    def consume(self, callback):
+        self._consuming = True
+        _start_consumer(self._run, callback)
+
+    def _run(self, callback):
+        while True:
+            _call(callback, self._queue.get())
+
+
+class CappedDidtxQueue(object):
+    """
+    The API inserts the confirmation ids in a capped collection that the consumer follows with a tailable cursor
+    """
+
+    def __init__(self, collection_name="didtxqueue", size=None):
+        self.collection_name = collection_name
+        self.size = size if size is not None else config.DIDTX_QUEUE_CAPPED_SIZE
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            db = Didtx._get_db()
+            try:
+                db.create_collection(self.collection_name, capped=True, size=self.size)
+            except CollectionInvalid:
+                # Already created by another process
+                pass
+            self._collection = db[self.collection_name]
+        return self._collection
+
+    def put(self, confirmation_id):
+        try:
+            self.collection.insert_one({"confirmation_id": confirmation_id, "created": datetime.datetime.utcnow()})
+        except Exception as e:
+            LOG.info(f"Could not queue the transaction {confirmation_id}, it will be sent by the cron job: {str(e)}")
+
+    def consume(self, callback):
+        _start_consumer(self._run, callback)
+
+    def _run(self, callback):
+        last_id = None
+        while True:
+            try:
+                if last_id is None:
+                    # Only the ids queued from now on, the cron job sends the older ones
+                    last = self.collection.find_one(sort=[("$natural", -1)])
+                    last_id = last["_id"] if last else False
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for item in cursor:
+                        last_id = item["_id"]
+                        _call(callback, item["confirmation_id"])
+            except PyMongoError as e:
+                LOG.info(f"Error while following the Didtx queue: {str(e)}")
+            # The cursor dies right away on an empty collection
+            time.sleep(1)
+
+
+class ChangeStreamDidtxQueue(object):
+    """
+    The consumer follows the inserts of v2 rows in the didtx collection, so the API has nothing to queue. Needs a
+    replica set
+    """
+
+    def put(self, confirmation_id):
+        pass
+
+    def consume(self, callback):
+        _start_consumer(self._run, callback)
+
+    def _run(self, callback):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.version": "2"}}]
+        while True:
+            try:
+                with Didtx._get_collection().watch(pipeline, resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        _call(callback, str(change["documentKey"]["_id"]))
+            except PyMongoError as e:
+                LOG.info(f"Error while watching the didtx collection: {str(e)}")
+                time.sleep(1)
+
+
+_didtx_queue = None
+_didtx_queue_lock = threading.Lock()
+
+
+def get_didtx_queue(name=None):
+    """
+    Returns the queue of the process. "auto" uses a change stream when MongoDB runs as a replica set and a capped
+    collection otherwise
+    """
+    global _didtx_queue
+    if name:
+        return _create_didtx_queue(name)
+    with _didtx_queue_lock:
+        if _didtx_queue is None:
+            _didtx_queue = _create_didtx_queue(config.DIDTX_QUEUE)
+        return _didtx_queue
+
+
+def _create_didtx_queue(name):
+    if name == "auto":
+        try:
+            is_master = Didtx._get_db().client.admin.command("isMaster")
+            name = "change_stream" if is_master.get("setName") or is_master.get("msg") == "isdbgrid" else "capped"
+        except Exception as e:
+            LOG.info(f"Could not find out whether MongoDB is a replica set: {str(e)}")
+            name = "capped"
+        LOG.info(f"Using the {name} Didtx queue")
+    if name == "change_stream":
+        return ChangeStreamDidtxQueue()
+    if name == "capped":
+        return CappedDidtxQueue()
+    LOG.info(f"Using the memory Didtx queue for DIDTX_QUEUE={name}, the transactions are only sent right away when "
+             f"the worker runs in this process")
+    return MemoryDidtxQueue()
+
+
+def _start_consumer(target, callback):
+    thread = threading.Thread(target=target, args=(callback,), name="didtx-queue", daemon=True)
+    thread.start()
+
+
+def _call(callback, confirmation_id):
+    try:
+        callback(confirmation_id)
+    except Exception as e:
+        LOG.info(f"Error while handling the queued transaction {confirmation_id}: {str(e)}")
@@ -1,56 +1,41 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime, timedelta
-from pymongo import MongoClient
+import threading
+import time
 
 from app import log, config
 from app.service import send_slack_notification
+from app.service.service_stats import get_service_stats
 
 LOG = log.get_logger()
 
+_last_rate_limit_notification = None
+_rate_limit_notification_lock = threading.Lock()
 
-def get_didtx_count():
-    mongo_client = MongoClient(config.MONGO_CONNECT_HOST)
-    db = mongo_client.get_database(config.MONGO["DATABASE"])
 
-    result = {
-        "today": {},
-        "total": {}
+def get_didtx_count():
+    stats = get_service_stats()[config.SERVICE_DIDPUBLISH]
+    return {
+        "today": stats["apps_today"],
+        "total": stats["apps"]
     }
 
-    date_today = datetime.utcnow() - timedelta(hours=24)
-    result_today = db.didtx.aggregate([
-        {"$match": {"created": {"$gt": date_today}}},
-        {"$group": {"_id": "$requestFrom", "count": {"$sum": 1}}},
-        {"$project": {"_id": 0, "name": "$_id", "count": "$count"}}
-    ])
-    for r in result_today:
-        app_name = r["name"].split("#", 1)[0]
-        if app_name in result["total"].keys():
-            result["today"][app_name] += r["count"]
-        else:
-            result["today"][app_name] = r["count"]
-
-    result_total = db.didtx.aggregate([
-        {"$group": {"_id": "$requestFrom", "count": {"$sum": 1}}},
-        {"$project": {"_id": 0, "name": "$_id", "count": "$count"}}
-    ])
-    for r in result_total:
-        app_name = r["name"].split("#", 1)[0]
-        if app_name in result["total"].keys():
-            result["total"][app_name] += r["count"]
-        else:
-            result["total"][app_name] = r["count"]
-
-    return result
 
-
-def api_rate_limit_reached(details):
-    message1 = "Global rate limit reached"
-    message2 = f"Max limit Allowed: {config.RATE_LIMIT_CREATE_DID} calls per {config.RATE_LIMIT_PERIOD / 60.0} minutes"
-    message3 = "Backing off {wait:0.1f} seconds after {tries} tries " \
-               "calling function {target} with args {args} and kwargs " \
-               "{kwargs}".format(**details)
+def api_rate_limit_reached(key, calls, period, retry_after):
+    """
+    Logs a request that was rejected by the rate limiter. At most one Slack notification is sent per period so
+    a client hammering the API doesn't also flood the channel, and it's sent from a thread so the request
+    isn't held up
+    """
+    message1 = "Rate limit reached"
+    message2 = f"Max limit Allowed for {key}: {calls} calls per {period / 60.0} minutes"
+    message3 = f"Rejecting the calls for {retry_after} seconds"
     LOG.info(f"Method: api_rate_limit_reached: {message1}\n{message2}\n{message3}")
+    global _last_rate_limit_notification
+    now = time.monotonic()
+    with _rate_limit_notification_lock:
+        if _last_rate_limit_notification is not None and now - _last_rate_limit_notification < period:
+            return
+        _last_rate_limit_notification = now
     slack_blocks = [
         {
             "type": "section",
@@ -83,4 +68,11 @@ def api_rate_limit_reached(details):
             "type": "divider"
         }
     ]
-    send_slack_notification(slack_blocks)
+    threading.Thread(target=_send_rate_limit_notification, args=(slack_blocks,), daemon=True).start()
+
+
+def _send_rate_limit_notification(slack_blocks):
+    try:
+        send_slack_notification(slack_blocks)
+    except Exception as e:
+        LOG.info(f"Could not send slack notification: Error: {e}")
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import math
+import threading
+from collections import deque
+
+from app import log, config
+
+LOG = log.get_logger()
+
+
+class GasEstimator(object):
+    """
+    Learns the gas used by publishDidTransaction from the receipts of the completed transactions. It only depends
+    on the operation of the didRequest and on the size of the calldata, so the samples are kept per operation and
+    size bucket. A bucket gives an estimate once it has min_samples receipts that agree within max_spread, otherwise
+    the real estimateGas is used
+    """
+
+    def __init__(self, bucket_size=None, min_samples=None, margin=None, max_spread=None, max_samples=20):
+        self.bucket_size = bucket_size if bucket_size is not None else config.GAS_ESTIMATOR_BUCKET_SIZE
+        self.min_samples = min_samples if min_samples is not None else config.GAS_ESTIMATOR_MIN_SAMPLES
+        self.margin = margin if margin is not None else config.GAS_ESTIMATOR_MARGIN
+        self.max_spread = max_spread if max_spread is not None else config.GAS_ESTIMATOR_MAX_SPREAD
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def estimate(self, operation, size, estimate_gas):
+        """
+        Returns the gas limit for a transaction of the given operation and calldata size. estimate_gas is called
+        when the samples of its bucket can't be trusted, its result gets the same margin as the learned gas
+        """
+        gas = self.get(operation, size)
+        if gas is not None:
+            return gas
+        return self.pad(estimate_gas())
+
+    def get(self, operation, size):
+        with self._lock:
+            samples = list(self._samples.get(self._key(operation, size), ()))
+        if len(samples) < self.min_samples:
+            return None
+        ratios = [gas_used / max(sample_size, 1) for sample_size, gas_used in samples]
+        if max(ratios) > min(ratios) * self.max_spread:
+            return None
+        # The largest sample covers the smaller payloads, the largest gas per byte covers the bigger ones
+        gas = max(max(gas_used for _, gas_used in samples), max(ratios) * size)
+        return self.pad(gas)
+
+    def pad(self, gas):
+        """
+        Adds the safety margin to a gas limit
+        """
+        return int(math.ceil(gas * (1 + self.margin)))
+
+    def observe(self, operation, size, gas_used):
+        with self._lock:
+            samples = self._samples.setdefault(self._key(operation, size), deque(maxlen=self.max_samples))
+            samples.append((size, gas_used))
+
+    def observe_failure(self, operation, size, gas_used):
+        """
+        A reverted transaction that used all the gas its bucket gives may have run out of gas, so the samples of the
+        bucket are dropped
+        """
+        gas = self.get(operation, size)
+        if gas is not None and gas_used >= gas:
+            self.forget(operation, size)
+
+    def forget(self, operation, size):
+        with self._lock:
+            self._samples.pop(self._key(operation, size), None)
+
+    def _key(self, operation, size):
+        return operation, size // self.bucket_size
+
+
+gas_estimator = GasEstimator()
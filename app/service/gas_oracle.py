@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from web3 import Web3
+
+from app import log, config
+from app.service.sidechain_connection_pool import sidechain_connection_pool
+from app.service.block_watcher import block_watcher
+
+LOG = log.get_logger()
+
+
+class GasOracle(object):
+    """
+    Keeps the gas price of the DID sidechain in memory. The block watcher has it fetched once per new block, so
+    building a transaction doesn't cost any call for its gas price. The price is fetched on the spot when it's older
+    than max_age seconds, and is always clamped to [min_price, max_price]
+    """
+
+    def __init__(self, max_age=None, min_price=None, max_price=None):
+        self.max_age = max_age if max_age is not None else config.GAS_ORACLE_MAX_AGE
+        self.min_price = min_price if min_price is not None else Web3.toWei(config.GAS_PRICE_MIN_GWEI, "gwei")
+        self.max_price = max_price if max_price is not None else Web3.toWei(config.GAS_PRICE_MAX_GWEI, "gwei")
+        self.connection_pool = sidechain_connection_pool
+        self.block_watcher = block_watcher
+        self._lock = threading.Lock()
+        self._subscribed = False
+        self._gas_price = None
+        self._updated = None
+        self._block_number = None
+
+    def get_gas_price(self):
+        """
+        Returns the gas price in wei to use for a new transaction
+        """
+        self._ensure_started()
+        gas_price, updated = self._gas_price, self._updated
+        if gas_price is None or time.monotonic() - updated > self.max_age:
+            try:
+                gas_price = self.refresh()
+            except Exception as e:
+                if gas_price is None:
+                    raise
+                LOG.info(f"Could not refresh the gas price, using the one from {time.monotonic() - updated:.0f} "
+                         f"seconds ago: {str(e)}")
+        return self.clamp(gas_price)
+
+    def clamp(self, gas_price):
+        if self.min_price:
+            gas_price = max(gas_price, self.min_price)
+        if self.max_price:
+            gas_price = min(gas_price, self.max_price)
+        return gas_price
+
+    def on_new_block(self, block_number):
+        if block_number == self._block_number:
+            return
+        self._block_number = block_number
+        try:
+            self.refresh()
+        except Exception as e:
+            LOG.info(f"Could not refresh the gas price at block {block_number}: {str(e)}")
+
+    def refresh(self):
+        gas_price = self.connection_pool.get_web3().eth.gas_price
+        self._gas_price, self._updated = gas_price, time.monotonic()
+        return gas_price
+
+    def _ensure_started(self):
+        if not self._subscribed:
+            with self._lock:
+                if not self._subscribed:
+                    self.block_watcher.subscribe(self.on_new_block)
+                    self._subscribed = True
+        self.block_watcher.start()
+
+
+gas_oracle = GasOracle()
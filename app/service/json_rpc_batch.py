@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from app import log, config
+from app.service.sidechain_connection_pool import sidechain_connection_pool
+
+LOG = log.get_logger()
+
+
+class JsonRpcTransportError(Exception):
+    """
+    The batch of the call didn't get an answer from the node, so the call may succeed if sent again
+    """
+
+
+class JsonRpcCall(object):
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        # Set when the whole batch failed (timeout, HTTP error, unexpected reply) rather than this call
+        self.transport_error = False
+
+
+class JsonRpcBatch(object):
+    """
+    Collects JSON-RPC calls and sends them to the DID sidechain as array requests of at most max_batch_size
+    calls each. Every call added gets its own result or error back once execute returns.
+    """
+
+    def __init__(self, endpoint_uri=None, max_batch_size=None):
+        self.endpoint_uri = endpoint_uri or config.DID_SIDECHAIN_RPC_URL_ETH
+        self.max_batch_size = max_batch_size or config.RPC_MAX_BATCH_SIZE
+        self.connection_pool = sidechain_connection_pool
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, params):
+        call = JsonRpcCall(method, params)
+        self._calls.append(call)
+        return call
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        for start in range(0, len(calls), self.max_batch_size):
+            self._send(calls[start:start + self.max_batch_size])
+        return calls
+
+    def _send(self, calls):
+        payload = [
+            {"jsonrpc": "2.0", "id": index, "method": call.method, "params": call.params}
+            for index, call in enumerate(calls)
+        ]
+        try:
+            session = self.connection_pool.get_session()
+            response = session.post(self.endpoint_uri, json=payload, timeout=self.connection_pool.timeout)
+            response.raise_for_status()
+            responses = response.json()
+            if not isinstance(responses, list):
+                # Some nodes answer a batch they can't handle with a single error object
+                raise ValueError(responses.get("error", responses) if isinstance(responses, dict) else responses)
+        except Exception as e:
+            LOG.info(f"Error while sending a batch of {len(calls)} calls to the DID sidechain: {str(e)}")
+            for call in calls:
+                call.error = str(e)
+                call.transport_error = True
+            return
+
+        responses = {r.get("id"): r for r in responses if isinstance(r, dict)}
+        for index, call in enumerate(calls):
+            r = responses.get(index)
+            if r is None:
+                call.error = "No response for this call in the batch"
+            elif r.get("error"):
+                error = r["error"]
+                call.error = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            else:
+                call.result = r.get("result")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import socket
+import uuid
+
+from pymongo.errors import DuplicateKeyError
+
+from app import log, config
+from app.model import LeaderLock as LeaderLockRow
+
+LOG = log.get_logger()
+
+
+class LeaderLock(object):
+    """
+    Lease stored in MongoDB so that only one process across all the replicas holds it at a time. The holder has
+    to renew it before it expires, otherwise another process takes it over
+    """
+
+    def __init__(self, name, ttl=None):
+        self.name = name
+        self.ttl = ttl or config.LEADER_LOCK_TTL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at = None
+
+    @property
+    def is_leader(self):
+        return self._expires_at is not None and self._expires_at > datetime.datetime.utcnow()
+
+    def acquire(self):
+        """
+        Takes the lock if it's free or expired, or renews it if this process already holds it.
+        Returns whether this process holds the lock
+        """
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.ttl)
+        was_leader = self.is_leader
+        try:
+            LeaderLockRow._get_collection().update_one(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": expires_at, "modified": now},
+                 "$setOnInsert": {"created": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lock exists and is held by another process, so the filter didn't match and the upsert failed
+            if was_leader:
+                LOG.info(f"Lost the leader lock '{self.name}'")
+            self._expires_at = None
+            return False
+        if not was_leader:
+            LOG.info(f"Acquired the leader lock '{self.name}' as {self.owner}")
+        self._expires_at = expires_at
+        return True
+
+    def release(self):
+        if self._expires_at is None:
+            return
+        LeaderLockRow._get_collection().delete_one({"_id": self.name, "owner": self.owner})
+        self._expires_at = None
+        LOG.info(f"Released the leader lock '{self.name}'")
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import log, config
+from app.model import RateLimitBucket
+
+LOG = log.get_logger()
+
+
+class LocalRateLimitStore(object):
+    """
+    Token buckets kept in the memory of the process. Every process gets the full limit, so only use it when a
+    single process serves the API or as a fallback.
+
+    The keys come from the calls, so the buckets are kept from the least to the most recently used and the ones idle
+    long enough to be full again are dropped, as a missing bucket is a full one. At most max_buckets are kept
+    """
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        """
+        Takes a token from the bucket of the key. Returns the tokens left, which is negative if there was none
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.pop(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                left = tokens
+            else:
+                left = tokens - 1
+            self._buckets[key] = (tokens, now, now + capacity / rate)
+            self._evict(now)
+            return left
+
+    def _evict(self, now):
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) <= self.max_buckets:
+                break
+            del self._buckets[key]
+
+
+class MongoRateLimitStore(object):
+    """
+    Token buckets shared by all the processes and replicas through the RateLimitBucket collection. Refilling and
+    taking a token is a single atomic update, using an update pipeline so it requires MongoDB 4.2+
+    """
+
+    def consume(self, key, capacity, rate):
+        now = datetime.datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]},
+                      "expires_at": now + datetime.timedelta(seconds=capacity / rate)}},
+            {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+        ]
+        col = RateLimitBucket._get_collection()
+        try:
+            row = col.find_one_and_update({"_id": key}, pipeline, projection={"tokens": 1, "allowed": 1},
+                                          upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # The first request of this key was counted by another process at the same time, the bucket now exists
+            row = col.find_one_and_update({"_id": key}, pipeline, projection={"tokens": 1, "allowed": 1},
+                                          return_document=ReturnDocument.AFTER)
+        return row["tokens"] if row["allowed"] else row["tokens"] - 1
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter. Each key gets a bucket of `calls` tokens that refills at calls/period per second
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else get_rate_limit_store()
+
+    def hit(self, key, calls, period):
+        """
+        Counts a call for the key. Returns None if it's allowed, otherwise the seconds until the next call is allowed
+        """
+        rate = calls / float(period)
+        try:
+            tokens = self.store.consume(key, calls, rate)
+        except Exception as e:
+            # Don't fail the requests because the store is unavailable
+            LOG.info(f"Error while checking the rate limit of {key}: {str(e)}")
+            return None
+        if tokens >= 0:
+            return None
+        return max(1, int(round(-tokens / rate)))
+
+
+def get_rate_limit_store(name=None):
+    name = name or config.RATE_LIMIT_STORE
+    if name == "mongo":
+        return MongoRateLimitStore()
+    return LocalRateLimitStore()
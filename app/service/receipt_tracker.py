@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+
+from web3 import Web3
+
+from app import log, config
+from app.service.did_sidechain_rpc_v2 import DidSidechainRpcV2
+from app.service.json_rpc_batch import JsonRpcTransportError
+
+LOG = log.get_logger()
+
+
+class ReceiptTracker(object):
+    """
+    Checks the receipts of all the in-flight DID transactions with a single JSON-RPC batch. It doesn't wait for the
+    missing ones: they stay in flight until a later check, which the cron job does on each new block, and time out
+    once they have been waited for timeout seconds
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout if timeout is not None else config.RECEIPT_TIMEOUT
+        self.did_sidechain_rpc = DidSidechainRpcV2()
+
+    def check_receipts(self, transactions):
+        """
+        transactions maps each txid to the UTC datetime it has been waited for since. Returns a dict keyed by the
+        txids that have a result, either a receipt, an error or a timeout, where each value has the same shape as
+        DidSidechainRpcV2.wait_for_transaction_receipt
+        """
+        if not transactions:
+            return {}
+        receipts = self.did_sidechain_rpc.get_transaction_receipts(list(transactions))
+        now = datetime.datetime.utcnow()
+        results = {}
+        for txid, waiting_since in transactions.items():
+            receipt = receipts.get(txid)
+            if isinstance(receipt, Exception) and not isinstance(receipt, JsonRpcTransportError):
+                LOG.info(f"Error while getting the receipt for {txid} from the DID sidechain: {str(receipt)}")
+                results[txid] = {
+                    "tx_receipt": {},
+                    "err_type": "Exception",
+                    "err_message": str(receipt)
+                }
+            elif receipt and not isinstance(receipt, JsonRpcTransportError):
+                results[txid] = {
+                    "tx_receipt": json.loads(Web3.toJSON(receipt)),
+                    "err_type": None,
+                    "err_message": None
+                }
+            elif (now - waiting_since).total_seconds() >= self.timeout:
+                # A node that wasn't reached says nothing about the transaction, so it only counts as a timeout
+                err_message = f"Transaction {txid} is not in the chain after {self.timeout} seconds"
+                if receipt:
+                    err_message += f", the last receipt request failed: {str(receipt)}"
+                LOG.info(f"Timed out while sending transactions to the DID sidechain: {err_message}")
+                results[txid] = {
+                    "tx_receipt": {},
+                    "err_type": "TimeExhausted",
+                    "err_message": err_message
+                }
+        return results
+
+
+receipt_tracker = ReceiptTracker()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import log
+from app.model import Servicecount
+
+LOG = log.get_logger()
+
+
+def get_service_counts(dids, service):
+    """
+    Returns the current count of a service for each of the given DIDs, using a single query
+    """
+    counts = {did: 0 for did in dids}
+    rows = Servicecount._get_collection().find(*_service_counts_query(counts, service))
+    for row in rows:
+        counts[row["did"]] = _count_from_row(row, service)
+    return counts
+
+
+def increment_service_count(did, service):
+    """
+    Atomically increments the daily and total count of a service for a DID and returns the new values
+    """
+    update = _increment_update(service)
+    col = Servicecount._get_collection()
+    try:
+        row = col.find_one_and_update({"did": did}, update, projection={f"data.{service}": 1}, upsert=True,
+                                      return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        # Another request inserted the first record of this DID at the same time, it now exists
+        row = col.find_one_and_update({"did": did}, update, projection={f"data.{service}": 1},
+                                      return_document=ReturnDocument.AFTER)
+    return row["data"][service]
+
+
+async def get_service_counts_async(collection, dids, service):
+    """
+    Same as get_service_counts using the motor collection of Servicecount
+    """
+    counts = {did: 0 for did in dids}
+    async for row in collection.find(*_service_counts_query(counts, service)):
+        counts[row["did"]] = _count_from_row(row, service)
+    return counts
+
+
+async def increment_service_count_async(collection, did, service):
+    """
+    Same as increment_service_count using the motor collection of Servicecount
+    """
+    update = _increment_update(service)
+    try:
+        row = await collection.find_one_and_update({"did": did}, update, projection={f"data.{service}": 1},
+                                                   upsert=True, return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        row = await collection.find_one_and_update({"did": did}, update, projection={f"data.{service}": 1},
+                                                   return_document=ReturnDocument.AFTER)
+    return row["data"][service]
+
+
+def get_did_service_count(did, service):
+    """
+    Returns the daily and total count of a service for a DID, as served by /v1/service_count/{service}/{did}
+    """
+    row = Servicecount._get_collection().find_one({"did": did.replace("did:elastos:", "").split("#")[0]})
+    return _service_count_as_dict(row, did, service)
+
+
+async def get_did_service_count_async(collection, did, service):
+    """
+    Same as get_did_service_count using the motor collection of Servicecount
+    """
+    row = await collection.find_one({"did": did.replace("did:elastos:", "").split("#")[0]})
+    return _service_count_as_dict(row, did, service)
+
+
+def _service_count_as_dict(row, did, service):
+    if row:
+        return Servicecount._from_son(row).service_count_as_dict(service)
+    return {
+        "id": "",
+        "did": did,
+        "service": service,
+        "count": 0,
+        "total_count": 0,
+        "created": "never",
+        "modified": "never"
+    }
+
+
+def _service_counts_query(counts, service):
+    return {"did": {"$in": list(counts.keys())}}, {"did": 1, f"data.{service}.count": 1}
+
+
+def _count_from_row(row, service):
+    return row.get("data", {}).get(service, {}).get("count", 0)
+
+
+def _increment_update(service):
+    now = datetime.utcnow()
+    return {
+        "$inc": {f"data.{service}.count": 1, f"data.{service}.total_count": 1},
+        "$set": {"modified": now},
+        "$setOnInsert": {"created": now}
+    }
@@ -1,39 +1,192 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime, timedelta
 
-from pymongo import MongoClient
+from bson import ObjectId
 
-from app import config
+from app import log, config
+from app.model import Didtx, ServiceStats
 
+LOG = log.get_logger()
 
-def get_service_count():
-    mongo_client = MongoClient(config.MONGO_CONNECT_HOST)
-    db = mongo_client.get_database(config.MONGO["DATABASE"])
+HOUR_FORMAT = "%Y%m%d%H"
+ALL_APPS = "_all"
 
-    result = {
-        "did_publish": {}
-    }
-    for service in result.keys():
+
+def get_service_count():
+    result = {}
+    for service, stats in get_service_stats().items():
         result[service] = {
-            "users": 0,
-            "today": 0,
-            "total": 0
+            "users": stats["users"],
+            "today": stats["today"],
+            "total": stats["total"],
+            "statuses": stats["statuses"]
         }
+    return result
 
-    result_users = db.didtx.aggregate([
-        {"$group": {"_id": "$did", "count": {"$sum": 1}}},
-        {"$project": {"_id": 0, "name": "$_id", "count": "$count"}}
-    ])
-    count_users = 0
-    for _ in result_users:
-        count_users += 1
-    result["did_publish"]["users"] = count_users
 
-    date_today = datetime.utcnow() - timedelta(hours=24)
-    result_today = db.didtx.count_documents({"modified": {"$gt": date_today}})
-    result["did_publish"]["today"] = result_today
+def get_service_stats():
+    """
+    Reads the counters kept up to date by record_didtx_created and record_didtx_status_changes. "today" is the
+    number of transactions created in the last 24 hours, by hour
+    """
+    # Empty until the worker builds the counters on this database, which it does as soon as it starts
+    row = ServiceStats._get_collection().find_one({"_id": config.SERVICE_DIDPUBLISH}) or {}
+    hours = last_24_hours()
+    apps = {}
+    apps_today = {}
+    for app_name, count in row.get("apps", {}).items():
+        apps[_unescape(app_name)] = count
+    for hour, counts in row.get("hours", {}).items():
+        if hour not in hours:
+            continue
+        for app_name, count in counts.items():
+            if app_name != ALL_APPS:
+                apps_today[_unescape(app_name)] = apps_today.get(_unescape(app_name), 0) + count
+    return {
+        config.SERVICE_DIDPUBLISH: {
+            "users": row.get("users", 0),
+            "today": sum(row.get("hours", {}).get(hour, {}).get(ALL_APPS, 0) for hour in hours),
+            "total": row.get("total", 0),
+            "apps": apps,
+            "apps_today": apps_today,
+            "statuses": row.get("statuses", {})
+        }
+    }
 
-    result_total = db.didtx.count_documents({})
-    result["did_publish"]["total"] = result_total
 
-    return result
+def record_didtx_created(request_from, new_user):
+    """
+    Counts a Didtx that was just created. new_user is whether it's the first transaction of the calling DID, see
+    is_new_user
+    """
+    ServiceStats._get_collection().update_one({"_id": config.SERVICE_DIDPUBLISH},
+                                              didtx_created_update(request_from, new_user), upsert=True)
+
+
+async def record_didtx_created_async(collection, request_from, new_user):
+    """
+    Same as record_didtx_created using the motor collection of ServiceStats
+    """
+    await collection.update_one({"_id": config.SERVICE_DIDPUBLISH},
+                                didtx_created_update(request_from, new_user), upsert=True)
+
+
+def record_didtx_status_changes(changes):
+    """
+    Counts the Didtx that changed status, changes being a list of (previous status, new status)
+    """
+    inc = {}
+    for previous_status, status in changes:
+        if previous_status == status:
+            continue
+        inc[f"statuses.{previous_status}"] = inc.get(f"statuses.{previous_status}", 0) - 1
+        inc[f"statuses.{status}"] = inc.get(f"statuses.{status}", 0) + 1
+    if inc:
+        ServiceStats._get_collection().update_one({"_id": config.SERVICE_DIDPUBLISH},
+                                                  {"$inc": inc, "$set": {"modified": datetime.utcnow()}}, upsert=True)
+
+
+def is_new_user(did, didtx_id):
+    """
+    Whether the Didtx just inserted is the first one of the DID, the same definition of a user as the distinct did
+    of reconcile_service_stats. Of two first transactions created at the same time, the one with the lowest id counts
+    """
+    return Didtx._get_collection().find_one(_earlier_didtx_query(did, didtx_id), {"_id": 1}) is None
+
+
+async def is_new_user_async(collection, did, didtx_id):
+    """
+    Same as is_new_user using the motor collection of Didtx
+    """
+    return await collection.find_one(_earlier_didtx_query(did, didtx_id), {"_id": 1}) is None
+
+
+def didtx_created_update(request_from, new_user):
+    now = datetime.utcnow()
+    hour = now.strftime(HOUR_FORMAT)
+    app_name = _escape(get_app_name(request_from))
+    return {
+        "$inc": {
+            "users": 1 if new_user else 0,
+            "total": 1,
+            f"apps.{app_name}": 1,
+            f"hours.{hour}.{ALL_APPS}": 1,
+            f"hours.{hour}.{app_name}": 1,
+            f"statuses.{config.SERVICE_STATUS_PENDING}": 1
+        },
+        "$set": {"modified": now}
+    }
+
+
+def reconcile_service_stats():
+    """
+    Recomputes all the counters from the didtx collection, which corrects any drift of the incremental updates and
+    drops the hourly counts older than a day. A transaction created while this runs may be missed until the next run
+    """
+    LOG.info("Reconciling the service statistics...")
+    col = Didtx._get_collection()
+    now = datetime.utcnow()
+    users = next(iter(col.aggregate([
+        {"$group": {"_id": "$did"}},
+        {"$count": "users"}
+    ])), {}).get("users", 0)
+
+    apps = {}
+    total = 0
+    for r in col.aggregate([{"$group": {"_id": "$requestFrom", "count": {"$sum": 1}}}]):
+        app_name = _escape(get_app_name(r["_id"]))
+        apps[app_name] = apps.get(app_name, 0) + r["count"]
+        total += r["count"]
+
+    statuses = {r["_id"]: r["count"] for r in col.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+                if r["_id"]}
+
+    hours = {}
+    since = (now - timedelta(hours=24)).replace(minute=0, second=0, microsecond=0)
+    for r in col.aggregate([
+        {"$match": {"created": {"$gte": since}}},
+        {"$group": {
+            "_id": {"hour": {"$dateToString": {"format": "%Y%m%d%H", "date": "$created"}}, "app": "$requestFrom"},
+            "count": {"$sum": 1}
+        }}
+    ]):
+        counts = hours.setdefault(r["_id"]["hour"], {})
+        app_name = _escape(get_app_name(r["_id"].get("app")))
+        counts[app_name] = counts.get(app_name, 0) + r["count"]
+        counts[ALL_APPS] = counts.get(ALL_APPS, 0) + r["count"]
+
+    row = {
+        "_id": config.SERVICE_DIDPUBLISH,
+        "users": users,
+        "total": total,
+        "apps": apps,
+        "hours": hours,
+        "statuses": statuses,
+        "reconciled": now,
+        "modified": now
+    }
+    ServiceStats._get_collection().replace_one({"_id": config.SERVICE_DIDPUBLISH}, row, upsert=True)
+    LOG.info(f"Reconciled the service statistics: {users} users, {total} transactions")
+    return row
+
+
+def last_24_hours():
+    now = datetime.utcnow()
+    return {(now - timedelta(hours=hours)).strftime(HOUR_FORMAT) for hours in range(24)}
+
+
+def get_app_name(request_from):
+    return (request_from or "").split("#", 1)[0] or "unknown"
+
+
+def _earlier_didtx_query(did, didtx_id):
+    return {"did": did, "_id": {"$lt": ObjectId(didtx_id)}}
+
+
+def _escape(app_name):
+    # Field names can't contain dots or start with $
+    return app_name.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _unescape(app_name):
+    return app_name.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
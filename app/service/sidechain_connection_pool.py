@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+
+from app import log, config
+
+LOG = log.get_logger()
+
+
+class SidechainConnectionPool(object):
+    """
+    Process-wide keep-alive HTTP connection pool used for every call to the DID sidechain. The Web3 instance
+    and the requests session are shared so consecutive calls reuse the same TCP/TLS connections. Both are
+    rebuilt after a fork since sockets can't be shared between processes.
+    """
+
+    def __init__(self, endpoint_uri=None):
+        self.endpoint_uri = endpoint_uri or config.DID_SIDECHAIN_RPC_URL_ETH
+        self.timeout = (config.RPC_CONNECT_TIMEOUT, config.RPC_READ_TIMEOUT)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._adapter = None
+        self._web3 = None
+
+    def get_session(self):
+        self._ensure_connected()
+        return self._session
+
+    def get_web3(self):
+        self._ensure_connected()
+        return self._web3
+
+    def get_stats(self):
+        """
+        Returns the number of requests and new connections made per host. Every request above the number of
+        connections reused an already open connection.
+        """
+        stats = {}
+        if not self._adapter or self._pid != os.getpid():
+            return stats
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if not pool:
+                continue
+            stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(pool.num_requests - pool.num_connections, 0),
+                "idle": pool.pool.qsize() if pool.pool else 0
+            }
+        return stats
+
+    def _ensure_connected(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            LOG.info(f"Opening DID sidechain connection pool to {self.endpoint_uri}")
+            adapter = HTTPAdapter(
+                pool_connections=config.RPC_POOL_CONNECTIONS,
+                pool_maxsize=config.RPC_POOL_MAXSIZE,
+                pool_block=config.RPC_POOL_BLOCK
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            w3 = Web3(Web3.HTTPProvider(self.endpoint_uri, request_kwargs={"timeout": self.timeout}, session=session))
+            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+            self._adapter, self._session, self._web3 = adapter, session, w3
+            self._pid = os.getpid()
+
+
+sidechain_connection_pool = SidechainConnectionPool()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+from eth_account import Account
+
+from app import log, config
+
+LOG = log.get_logger()
+
+
+class WalletKeyManager(object):
+    """
+    Keeps the decrypted private keys of the config.WALLETSV2 keystores in memory so the scrypt
+    KDF only runs once per wallet per process. Keys never leave this object, callers sign through
+    sign_transaction.
+    """
+
+    def __init__(self, wallets=None, password=None):
+        self.wallets = wallets if wallets is not None else config.WALLETSV2
+        self.password = password if password is not None else config.WALLETSV2_PASS
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def preload(self):
+        LOG.info(f"Decrypting {len(self.wallets)} wallet keystores...")
+        for wallet in self.wallets:
+            self._get_key(wallet)
+
+    def sign_transaction(self, wallet, tx):
+        return Account.sign_transaction(tx, self._get_key(wallet))
+
+    def _get_key(self, wallet):
+        address = json.loads(wallet)["address"].lower()
+        key = self._keys.get(address)
+        if key is None:
+            with self._lock:
+                key = self._keys.get(address)
+                if key is None:
+                    LOG.info(f"Decrypting keystore for wallet 0x{address}")
+                    key = Account.decrypt(wallet, self.password)
+                    self._keys[address] = key
+        return key
+
+
+wallet_key_manager = WalletKeyManager()
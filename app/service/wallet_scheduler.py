@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+
+from app import log, config
+from app.model import WalletInfo
+from app.service.did_sidechain_rpc_v2 import DidSidechainRpcV2
+
+LOG = log.get_logger()
+
+
+class WalletScheduler(object):
+    """
+    Spreads pending transactions over the wallets and hands out sequential nonces per wallet so that several
+    transactions can be sent from the same wallet within one block, at most max_tx_per_wallet until new_block. The
+    next nonce of every wallet is tracked locally and in the WalletInfo collection, and is resynced from the chain at
+    the start of every run and whenever sending a transaction fails.
+    """
+
+    def __init__(self, wallets=None, max_tx_per_wallet=None):
+        self.wallets = wallets if wallets is not None else config.WALLETSV2
+        self.max_tx_per_wallet = max_tx_per_wallet or config.WALLETSV2_MAX_TX_PER_BLOCK
+        self.did_sidechain_rpc = DidSidechainRpcV2()
+        self._nonces = {}
+        self._sent = {}
+
+    @property
+    def capacity(self):
+        return sum(self._remaining(wallet) for wallet in self._available_wallets())
+
+    @property
+    def synced(self):
+        return bool(self._nonces)
+
+    def new_block(self):
+        self._sent = {}
+
+    def sync(self):
+        addresses = list({self.get_address(wallet) for wallet in self.wallets})
+        chain_nonces = self.did_sidechain_rpc.get_transaction_counts(addresses, "pending")
+        for address in addresses:
+            self._set_nonce(address, chain_nonces[address])
+
+    def resync(self, address):
+        chain_nonces = self.did_sidechain_rpc.get_transaction_counts([address], "pending")
+        self._set_nonce(address, chain_nonces[address])
+
+    def schedule(self, rows):
+        """
+        Assigns the rows to the wallets in round robin so each wallet gets at most the slots it has left in this
+        block. Returns a list of (wallet, row) pairs in the order they should be sent
+        """
+        wallets = self._available_wallets()
+        if not wallets:
+            LOG.info("No wallet is available to send transactions")
+            return []
+        remaining = {wallet: self._remaining(wallet) for wallet in wallets}
+        scheduled = []
+        rows = list(rows)
+        while rows and any(remaining.values()):
+            for wallet in wallets:
+                if rows and remaining[wallet]:
+                    scheduled.append((wallet, rows.pop(0)))
+                    remaining[wallet] -= 1
+        return scheduled
+
+    def get_nonce(self, address):
+        return self._nonces.get(address)
+
+    def increment(self, address):
+        nonce = self._nonces.get(address)
+        if nonce is None:
+            return
+        self._nonces[address] = nonce + 1
+        self._sent[address] = self._sent.get(address, 0) + 1
+        WalletInfo.objects(address=address).update_one(
+            set__nonce=nonce + 1, set__modified=datetime.datetime.utcnow(), upsert=True
+        )
+
+    @staticmethod
+    def get_address(wallet):
+        return f"0x{json.loads(wallet)['address']}"
+
+    def _available_wallets(self):
+        return [wallet for wallet in self.wallets if self._nonces.get(self.get_address(wallet)) is not None]
+
+    def _remaining(self, wallet):
+        return max(self.max_tx_per_wallet - self._sent.get(self.get_address(wallet), 0), 0)
+
+    def _set_nonce(self, address, chain_nonce):
+        if chain_nonce is None:
+            LOG.info(f"Could not retrieve the nonce of wallet {address}. It won't be used until the next run")
+            self._nonces.pop(address, None)
+            return
+        row = WalletInfo.objects(address=address).first()
+        if not row:
+            row = WalletInfo(address=address)
+        elif row.nonce != chain_nonce:
+            LOG.info(f"Nonce of wallet {address} is {row.nonce} locally but {chain_nonce} on chain. Resyncing")
+        if row.nonce != chain_nonce or not row.id:
+            row.nonce = chain_nonce
+            row.save()
+        self._nonces[address] = chain_nonce
@@ -5,11 +5,12 @@ from web3.types import GasPriceStrategy
 from app import log, config
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
-from web3.gas_strategies.time_based import fast_gas_price_strategy, slow_gas_price_strategy, medium_gas_price_strategy
 import statistics
 from app.model import WalletInfo
-
-from pymongo import MongoClient
+from app.service.wallet_key_manager import wallet_key_manager
+from app.service.sidechain_connection_pool import sidechain_connection_pool
+from app.service.gas_oracle import gas_oracle
+from app.service.gas_estimator import gas_estimator
 
 import json
 
@@ -47,39 +48,61 @@ class Web3DidAdapter(object):
         self.contract_address = config.DID_CONTRACT_ADDRESS
         self.chainId = config.DID_CHAIN_ID
         self.did_sidechain_fee = 0.000001
+        self.key_manager = wallet_key_manager
+        self.connection_pool = sidechain_connection_pool
+        self.gas_oracle = gas_oracle
+        self.gas_estimator = gas_estimator
+
+    def create_transaction(self, wallet, nonce, payload, learned_gas=False):
+        """
+        Builds and signs the transaction publishing the didRequest. With learned_gas, the gas limit comes from the gas
+        estimator when it can instead of estimateGas, which is also how the didRequest is validated on the API
+        """
+        cdata, gas, err_message = self.prepare_transaction(payload, wallet, estimate_gas=not learned_gas)
+        if err_message:
+            return None, err_message
+        return self.sign_transaction(wallet, nonce, cdata, gas, self.get_operation(payload))
+
+    def prepare_transaction(self, payload, wallet=None, estimate_gas=True):
+        """
+        Returns the calldata of the transaction publishing the didRequest as bytes, its gas limit estimated from the
+        wallet if estimate_gas is set and an error message. The calldata and gas limit are stored with the Didtx so
+        that the cron job only has to sign it.
+
+        The estimate is made against the chain state at create time and the cron job doesn't call estimateGas again
+        before sending, so a transaction that would now revert is sent and pays for its gas instead of being rejected
+        for free. The gas limit gets the margin of the gas estimator so that a state change which only makes the
+        transaction more expensive doesn't also make it run out of gas
+        """
+        try:
+            cdata = self.encode_transaction_data(payload)
+            gas = None
+            if estimate_gas:
+                gas = self.gas_estimator.pad(self.estimate_gas(wallet, cdata))
+            return Web3.toBytes(hexstr=cdata), gas, None
+        except Exception as e:
+            LOG.info(f"Error creating transaction: {str(e)}")
+            return None, None, str(e)
 
-    def create_transaction(self, wallet, nonce, payload):
+    def sign_transaction(self, wallet, nonce, cdata, gas=None, operation=""):
+        """
+        Signs the transaction with the given calldata. Without a gas limit, it comes from the gas estimator
+        """
         signed_tx, err_message = None, None
         try:
-            w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
-            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-
-            contract: Contract = w3.eth.contract(address=self.contract_address, abi=self.PUBLISH_CONTRACT_ABI)
-            pvt_key = w3.eth.account.decrypt(wallet, config.WALLETSV2_PASS)
-
-            wallet_address = Web3.toChecksumAddress(f'0x{json.loads(wallet)["address"]}')
-
-            w3.eth.setGasPriceStrategy(medium_gas_price_strategy)
-
-            if not isinstance(payload, str):
-                json_payload = json.dumps(payload)
-            else:
-                json_payload = payload
-
-            estimated_gas = contract.functions.publishDidTransaction(json_payload).estimateGas({'from': wallet_address})
-
-            cdata = contract.encodeABI(fn_name="publishDidTransaction", args=[json_payload])
-
+            if gas is None:
+                gas = self.gas_estimator.estimate(operation, self.calldata_size(cdata),
+                                                  lambda: self.estimate_gas(wallet, cdata))
             tx = {
-                "data": cdata,
+                "data": self.to_hex(cdata),
                 "to": self.contract_address,
-                'gas': estimated_gas,
-                'gasPrice': w3.eth.gas_price,
+                'gas': gas,
+                'gasPrice': self.gas_oracle.get_gas_price(),
                 'nonce': nonce,
                 'chainId': self.chainId
             }
 
-            signed_tx = w3.eth.account.sign_transaction(tx, pvt_key)
+            signed_tx = self.key_manager.sign_transaction(wallet, tx)
 
             return signed_tx, err_message
         except Exception as e:
@@ -87,7 +110,55 @@ class Web3DidAdapter(object):
             err_message = str(e)
             return signed_tx, err_message
 
+    def estimate_gas(self, wallet, cdata):
+        w3 = self.connection_pool.get_web3()
+        wallet_address = Web3.toChecksumAddress(f'0x{json.loads(wallet)["address"]}')
+        return w3.eth.estimate_gas({"from": wallet_address, "to": self.contract_address, "data": self.to_hex(cdata)})
+
+    def encode_transaction_data(self, payload):
+        # ABI encoding is done locally so this does not need a connection to the DID sidechain
+        contract: Contract = Web3().eth.contract(address=self.contract_address, abi=self.PUBLISH_CONTRACT_ABI)
+        return contract.encodeABI(fn_name="publishDidTransaction", args=[self.to_json_payload(payload)])
+
+    def observe_receipt(self, payload, tx_receipt, cdata=None):
+        """
+        Feeds the gas used by a mined transaction to the gas estimator
+        """
+        gas_used = tx_receipt.get("gasUsed")
+        if not gas_used:
+            return
+        operation = self.get_operation(payload)
+        size = self.calldata_size(cdata or self.encode_transaction_data(payload))
+        if tx_receipt.get("status") == 1:
+            self.gas_estimator.observe(operation, size, gas_used)
+        else:
+            self.gas_estimator.observe_failure(operation, size, gas_used)
+
+    @staticmethod
+    def get_operation(payload):
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        return payload.get("header", {}).get("operation", "")
+
+    @staticmethod
+    def calldata_size(cdata):
+        if isinstance(cdata, bytes):
+            return len(cdata)
+        return (len(cdata) - 2) // 2
+
+    @staticmethod
+    def to_hex(cdata):
+        if isinstance(cdata, bytes):
+            return Web3.toHex(cdata)
+        return cdata
+
+    @staticmethod
+    def to_json_payload(payload):
+        if not isinstance(payload, str):
+            return json.dumps(payload)
+        return payload
+
     def increment_nonce(self, wallet_address):
-        w3 = Web3(Web3.HTTPProvider(self.sidechain_rpc))
+        w3 = self.connection_pool.get_web3()
         nonce = w3.eth.get_transaction_count(Web3.toChecksumAddress(f"0x{wallet_address}"))
         return nonce
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Runs the cron jobs. Start one or more of them next to the API server; only the one holding the leader lock runs
+# the jobs while the others stand by to take over:
+#   python -m app.worker
+import functools
+import signal
+import sys
+import threading
+from datetime import datetime
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from app import log, config
+from app.db import mongo
+from app.service import LeaderLock, reconcile_service_stats, block_watcher, get_didtx_queue, wallet_key_manager
+
+from app.cronjobv2 import cron_send_daily_stats_v2, cron_send_tx_to_did_sidechain_v2, \
+    cron_update_recent_did_documents, warm_up_gas_estimator, dispatch_didtx
+
+LOG = log.get_logger()
+
+leader_lock = LeaderLock("cron_scheduler")
+new_block = threading.Event()
+
+
+def run_if_leader(job):
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        if not leader_lock.is_leader:
+            return
+        return job(*args, **kwargs)
+    return wrapper
+
+
+def renew_leader_lock():
+    try:
+        leader_lock.acquire()
+    except Exception as e:
+        LOG.info(f"Could not renew the leader lock: {str(e)}")
+
+
+def run_on_new_block(job):
+    """
+    Runs the job when a block was added to the DID sidechain since its last run, or on each call while the block
+    watcher can't reach the DID sidechain
+    """
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        if not new_block.is_set() and block_watcher.is_healthy():
+            return
+        new_block.clear()
+        return job(*args, **kwargs)
+    return wrapper
+
+
+def trigger_on_new_block(scheduler, job_id):
+    """
+    Runs the job as soon as a block is added to the DID sidechain instead of waiting for its next interval
+    """
+    def on_new_block(block_number):
+        new_block.set()
+        if leader_lock.is_leader:
+            scheduler.modify_job(job_id, next_run_time=datetime.now())
+    return on_new_block
+
+
+def main():
+    mongo.connect()
+    scheduler = BlockingScheduler()
+    # Renewed well within its TTL so the lock doesn't expire between two renewals
+    scheduler.add_job(renew_leader_lock, 'interval', seconds=max(1, config.LEADER_LOCK_TTL // 3))
+
+    # Triggered by every new block. The interval is a fallback that only runs while the block watcher can't reach the
+    # DID sidechain, so an idle chain doesn't cost an RPC every CRON_INTERVAL_V2
+    scheduler.add_job(run_if_leader(run_on_new_block(cron_send_tx_to_did_sidechain_v2)), 'interval',
+                      seconds=config.CRON_INTERVAL_V2, id="send_tx_to_did_sidechain")
+    scheduler.add_job(run_if_leader(cron_update_recent_did_documents), 'interval', seconds=config.CRON_INTERVAL)
+    scheduler.add_job(run_if_leader(cron_send_daily_stats_v2), 'cron', day='*', hour=0, minute=0)
+    scheduler.add_job(run_if_leader(reconcile_service_stats), 'interval',
+                      seconds=config.SERVICE_STATS_RECONCILE_INTERVAL, next_run_time=datetime.now())
+
+    # Stopping the container sends SIGTERM, exit cleanly so the lock is released for the standby workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    renew_leader_lock()
+    # Only the worker signs transactions, so the API processes never decrypt the keystores
+    if config.WALLETSV2_PRELOAD_KEYS:
+        wallet_key_manager.preload()
+    warm_up_gas_estimator()
+    block_watcher.subscribe(trigger_on_new_block(scheduler, "send_tx_to_did_sidechain"))
+    # The transactions created by the API are sent right away, the cron job sends the ones left Pending
+    get_didtx_queue().consume(run_if_leader(dispatch_didtx))
+    LOG.info("Starting the cron worker...")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        leader_lock.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# WSGI entry point of the API server:
+#   gunicorn app.wsgi:application
+from app import create_app
+
+application = create_app()
@@ -0,0 +1,22 @@
+#!/usr/bin/env bash
+# Entry point of the docker image. The models don't create their indexes on first use, and the unique and TTL
+# indexes are needed for the service counters and the expiry of the cached documents, so they're built first
+python -m app.model.indexes || echo "Could not build the MongoDB indexes, starting anyway"
+
+if [ "${RUN_WORKER}" != "True" ]; then
+    exec "$@"
+fi
+
+# The image runs as a single container, so the cron worker is started next to the API server. When either of them
+# exits the other one is stopped too, so the container is restarted with both. SIGTERM is forwarded to both so the
+# worker releases its leader lock
+python -m app.worker &
+worker_pid=$!
+"$@" &
+server_pid=$!
+trap 'kill -TERM $server_pid $worker_pid 2>/dev/null' TERM INT
+wait -n
+status=$?
+kill -TERM $server_pid $worker_pid 2>/dev/null
+wait
+exit $status
@@ -18,8 +18,9 @@ function docker_start () {
     docker build -t tuumtech/assist-restapi-node .
     docker run --name assist-restapi-node           \
       -v ${PWD}/.env:/src/.env              \
+      -e ASGI=${ASGI:-False}                \
       -p 8000:5000                          \
-      tuumtech/assist-restapi-node
+      -d tuumtech/assist-restapi-node
 }
 
 function start () {
@@ -43,12 +44,20 @@ function start () {
     ;;
     esac
 
-    gunicorn -b 0.0.0.0:8000 --reload app:application
+    python -m app.model.indexes
+    python -m app.worker &
+    if [ "${ASGI}" == "True" ]; then
+        gunicorn -b 0.0.0.0:8000 --reload -k uvicorn.workers.UvicornWorker app.asgi:application
+    else
+        gunicorn -b 0.0.0.0:8000 --reload app.wsgi:application
+    fi
 }
 
 function stop () {
     docker container stop tuum-mongo || true && docker container rm -f tuum-mongo || true
     docker container stop assist-restapi-node || true && docker container rm -f assist-restapi-node || true
+    # The worker releases its leader lock on SIGTERM
+    ps -ef | grep app.worker | awk '{print $2}' | xargs kill
     ps -ef | grep gunicorn | awk '{print $2}' | xargs kill -9
 }
 
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Compares the JSON serializers of the API responses on a page of Didtx rows built from the example request:
+#   PYTHONPATH=. python scripts/benchmark_serialization.py [rows] [iterations]
+import datetime
+import json
+import os
+import sys
+import timeit
+
+from bson import ObjectId
+
+from app.api.common.base import StdlibJsonSerializer, OrjsonSerializer, orjson
+
+
+def build_rows(count):
+    with open(os.path.join(os.path.dirname(__file__), "..", "test", "example_did_request2.json")) as f:
+        data = json.load(f)
+    now = datetime.datetime.utcnow()
+    return [{
+        "id": ObjectId(),
+        "did": data["did"].replace("did:elastos:", ""),
+        "requestFrom": data["requestFrom"],
+        "didRequestDid": data["did"].replace("did:elastos:", ""),
+        "didRequest": data["didRequest"],
+        "status": "Completed",
+        "memo": data["memo"],
+        "extraInfo": {},
+        "blockchainTxId": "0x" + "ab" * 32,
+        "blockchainTx": {"blockNumber": 1000000 + index, "gasUsed": 54000, "status": 1, "logs": []},
+        "version": "2",
+        "numTimeout": 0,
+        "walletUsed": "0x365b70f14e10b02bef7e463eca6aa3e75ca3cdb1",
+        "created": now - datetime.timedelta(minutes=index),
+        "modified": now
+    } for index in range(count)]
+
+
+def main(count=100, iterations=1000):
+    body = {"meta": {"code": 200, "message": "OK"}, "data": build_rows(count)}
+    serializers = [StdlibJsonSerializer()]
+    if orjson is not None:
+        serializers.append(OrjsonSerializer())
+    else:
+        print("orjson is not installed, only the stdlib serializer is measured")
+
+    results = {}
+    for serializer in serializers:
+        size = len(serializer.dumps(body))
+        seconds = timeit.timeit(lambda: serializer.dumps(body), number=iterations)
+        results[serializer.name] = seconds
+        print(f"{serializer.name:>8}: {seconds / iterations * 1000:.3f} ms per response of {count} rows ({size} bytes)")
+    if len(results) > 1:
+        print(f"orjson is {results['stdlib'] / results['orjson']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])